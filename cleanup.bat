@@ -29,7 +29,7 @@ del /Q ml_model\QUICKSTART.md 2>nul
 del /Q ml_model\RUN_SYSTEM.md 2>nul
 
 echo Removing runtime files...
-del /Q ml_model\traffic_log.json 2>nul
+del /Q ml_model\traffic_log.jsonl 2>nul
 del /Q ml_model\emergency_state.json 2>nul
 rmdir /S /Q ml_model\__pycache__ 2>nul
 
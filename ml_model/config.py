@@ -94,6 +94,16 @@ LANE_SOURCES_BY_MODE = {
 # a custom combination that is not covered above.
 LANE_SOURCES = LANE_SOURCES_BY_MODE.get(SYSTEM_MODE, LANE_SOURCES_BY_MODE["TWO_VIDEO"])
 
+# Open "ip"/"esp32" streams through a GStreamer appsink that only ever keeps
+# the newest frame (needs OpenCV built with GStreamer; the pip wheels are not).
+# Falls back to the default backend if the pipeline can't be opened.
+USE_GSTREAMER = False
+
+# H.264 hardware decoder for the GStreamer path (RTSP streams and .mp4 files):
+# "nvv4l2decoder" on Jetson, "nvh264dec" on x86 with an NVIDIA GPU.
+# None keeps software decoding (avdec_h264).
+GSTREAMER_HW_DECODER = None
+
 # Groups map keeps lane associations for North/South and East/West
 LANE_GROUPS = {
     "NorthSouth": ["North", "South"],
@@ -107,6 +117,10 @@ LANE_GROUPS = {
 # Arduino COM Port (Windows) or /dev/ttyUSB0 (Linux) or /dev/tty.usbserial (Mac)
 ARDUINO_PORT = "COM5"  # Change this to your Arduino port
 ARDUINO_BAUD_RATE = 9600
+# Seconds between consecutive signal commands. Set 0 if your sketch reads
+# whole lines from its serial buffer: both signal heads of a phase change
+# then go out in a single serial write.
+ARDUINO_CMD_SPACING = 0.1
 
 # ============================================================
 # TRAFFIC LIGHT TIMING
@@ -121,6 +135,75 @@ ALL_RED_TIME = 2       # All red safety buffer (seconds)
 # VEHICLE DETECTION
 # ============================================================
 
+# YOLOv8 weights. Ultralytics selects the inference backend from the file type,
+# so an exported engine can be dropped in here without other changes.
+#   NVIDIA GPU (TensorRT INT8, calibrate on ~200 frames from your cameras):
+#     yolo export model=yolov8n.pt format=engine int8=True imgsz=384 data=calibration.yaml
+#     MODEL_PATH = "yolov8n.engine"
+#   ARM / edge devices (TFLite full-integer quantization):
+#     yolo export model=yolov8n.pt format=tflite int8=True imgsz=384
+#     MODEL_PATH = "yolov8n_saved_model/yolov8n_full_integer_quant.tflite"
+# Falls back to yolov8n.pt if the configured file is missing.
+MODEL_PATH = "yolov8n.pt"
+
+# Or let IntelliFlow build the engine itself: with a .pt MODEL_PATH and a CUDA
+# device, the first run exports <model>.engine (FP16, or INT8 when
+# CALIBRATION_DATA names a dataset yaml of frames from your cameras) and later
+# runs load it directly. Delete the .engine file after changing these settings.
+EXPORT_TENSORRT = False
+CALIBRATION_DATA = None
+
+# Working frame size (width, height). Every source is scaled to this once at
+# capture, and detection, overlays and the dashboard stream all use it. The
+# info panel needs at least ~400px of width.
+FRAME_SIZE = (640, 480)
+
+# Detector input size in pixels. Cameras stay at FRAME_SIZE for the dashboard;
+# frames are letterboxed down to this for YOLO. 384 is plenty for road-scale
+# vehicles, use 640 for small/distant ones. Exported engines must match it.
+DETECT_IMGSZ = 384
+
+# Run detection on every Nth frame and reuse the last boxes in between
+# (counts are smoothed over several detections anyway). 1 = every frame.
+DETECT_EVERY_N = 5
+# While a lane's count holds steady (+/-1) its interval grows by one frame per
+# detection up to this cap, and drops back to DETECT_EVERY_N when it changes
+DETECT_EVERY_MAX = 15
+
+# Letterbox/normalize frames on the GPU with NVIDIA DALI (requires
+# nvidia-dali and a CUDA device; ignored otherwise)
+USE_DALI = False
+
+# Decode video-file lanes on the GPU with NVDEC via PyNvVideoCodec (requires
+# a CUDA device; webcams and network streams always use OpenCV)
+USE_NVDEC = False
+
+# Encode dashboard stream frames with nvJPEG (torchvision 0.19+ on a CUDA
+# device) instead of OpenCV's CPU JPEG encoder
+USE_NVJPEG = False
+
+# JPEG quality of the dashboard video streams (lower = faster encode, smaller frames)
+STREAM_JPEG_QUALITY = 75
+
+# Worker threads for OpenCV's internal pool (resize/JPEG/drawing). Kept low
+# so it doesn't compete with YOLO; default is 2 with a GPU, 1 without.
+# OPENCV_THREADS = 2
+
 DETECTION_CONFIDENCE = 0.4  # Lower = detect more vehicles, Higher = detect only confident ones
 VEHICLE_CLASSES = [2, 3, 5, 7]  # COCO classes: 2=car, 3=motorcycle, 5=bus, 7=truck
 
+
+# ============================================================
+# LOCAL DISPLAY
+# ============================================================
+
+# Show the tiled OpenCV preview window (auto-disabled when no display is found)
+SHOW_LOCAL_WINDOW = True
+
+
+# ============================================================
+# LOGGING
+# ============================================================
+
+# Console level for signal-cycle, EV and Arduino messages ("INFO", "WARNING", ...)
+LOG_LEVEL = "INFO"
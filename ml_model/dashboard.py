@@ -4,20 +4,44 @@ Flask backend API for React frontend and WebSocket updates
 Includes video streaming for live vehicle detection
 """
 
+# eventlet must patch the stdlib before Flask/SocketIO import socket/threading.
+# Only a standalone dashboard is patched: imported by intelliflow_ml, the
+# patch would turn the controller's capture/inference/serial threads into
+# green threads that block each other, so SocketIO runs in threading mode.
+ASYNC_MODE = "threading"
+if __name__ == "__main__":
+    try:
+        import eventlet
+        import eventlet.wsgi
+        eventlet.monkey_patch()
+        ASYNC_MODE = "eventlet"
+    except ImportError:
+        pass
+
 from flask import Flask, jsonify, Response, request
 from flask_cors import CORS
 from flask_socketio import SocketIO, emit
+from werkzeug.serving import WSGIRequestHandler, make_server
 import json
 import os
 from datetime import datetime
 import base64
+import threading
+import traceback
+import socket
 import time
 
+try:
+    import orjson
+    _json_loads = orjson.loads  # its JSONDecodeError subclasses json's
+except ImportError:
+    _json_loads = json.loads
+
 app = Flask(__name__)
 CORS(app)  # Enable CORS for React frontend
-socketio = SocketIO(app, cors_allowed_origins="*")
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode=ASYNC_MODE)
 
-DATA_FILE = "traffic_log.json"
+DATA_FILE = "traffic_log.jsonl"
 EV_STATE_FILE = "emergency_state.json"
 
 # Global reference to traffic controller for video streaming
@@ -27,39 +51,57 @@ traffic_controller = None
 # Emergency Vehicle Preemption (EVP) State Management
 # ============================================================
 
+_evp_cache = (None, None)  # (file signature, parsed state)
+
+def _default_evp_state():
+    return {
+        "active": False,
+        "lane": None,
+        "started_at": None,
+        "eta_seconds": None,
+        "expected_arrival_ts": None
+    }
+
 def load_evp_state():
     """Load emergency vehicle preemption state from JSON file"""
-    if not os.path.exists(EV_STATE_FILE):
-        default_state = {
-            "active": False,
-            "lane": None,
-            "started_at": None,
-            "eta_seconds": None,
-            "expected_arrival_ts": None
-        }
+    global _evp_cache
+    try:
+        st = os.stat(EV_STATE_FILE)
+    except OSError:
+        default_state = _default_evp_state()
         save_evp_state(default_state)
         return default_state
+    # Only re-parse after the file changed (save_evp_state replaces it, so
+    # the inode changes too); callers get their own copy since they add
+    # fields like remaining_seconds
+    signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+    if _evp_cache[0] == signature:
+        return dict(_evp_cache[1])
     try:
-        with open(EV_STATE_FILE, "r") as f:
-            return json.load(f)
+        with open(EV_STATE_FILE, "rb") as f:
+            state = _json_loads(f.read())
     except (json.JSONDecodeError, IOError):
-        default_state = {
-            "active": False,
-            "lane": None,
-            "started_at": None,
-            "eta_seconds": None,
-            "expected_arrival_ts": None
-        }
+        default_state = _default_evp_state()
         save_evp_state(default_state)
         return default_state
+    _evp_cache = (signature, state)
+    return dict(state)
 
 def save_evp_state(state):
     """Save emergency vehicle preemption state to JSON file"""
+    # Write a temp file and rename it over the old one, so the controller
+    # (which polls this file) never reads a half-written state
+    tmp_file = EV_STATE_FILE + ".tmp"
     try:
-        with open(EV_STATE_FILE, "w") as f:
+        with open(tmp_file, "w") as f:
             json.dump(state, f, indent=2)
-    except IOError as e:
+        os.replace(tmp_file, EV_STATE_FILE)
+    except OSError as e:
         print(f"⚠️ Failed to save EV state: {e}")
+        return
+    # An in-process controller reacts now rather than at its next poll
+    if traffic_controller is not None:
+        traffic_controller.notify_ev_update()
 
 def require_secret(request):
     """Check if request has valid shared secret (optional auth)"""
@@ -73,16 +115,43 @@ def set_traffic_controller(controller):
     global traffic_controller
     traffic_controller = controller
 
-def read_data():
-    """Read traffic log data from JSON file"""
-    if not os.path.exists(DATA_FILE):
+_read_cache = (None, [])  # (file signature, parsed tail)
+
+def read_data(limit=50):
+    """Read the most recent traffic log entries from the JSON Lines file"""
+    global _read_cache
+    try:
+        st = os.stat(DATA_FILE)
+    except OSError:
         return []
-    with open(DATA_FILE, "r") as f:
+    # The log only grows once per signal cycle; reuse the last parse until then
+    signature = (st.st_mtime_ns, st.st_size)
+    if _read_cache[0] == signature:
+        return list(_read_cache[1])
+
+    # Read backwards from the end until enough lines are in the buffer, so
+    # the cost stays flat however long the log gets
+    with open(DATA_FILE, "rb") as f:
+        end = f.seek(0, os.SEEK_END)
+        pos, buf = end, b""
+        while pos > 0 and buf.count(b"\n") <= limit:
+            step = min(65536, pos)
+            pos -= step
+            f.seek(pos)
+            buf = f.read(step) + buf
+    lines = buf.splitlines()
+    if pos > 0:
+        lines = lines[1:]  # first line is cut off
+
+    data = []
+    for line in lines[-limit:]:
         try:
-            data = json.load(f)
+            data.append(_json_loads(line))
         except json.JSONDecodeError:
-            data = []
-    return data[-50:]  # Return last 50 entries
+            # Skip a line the controller is still writing
+            continue
+    _read_cache = (signature, data)
+    return list(data)
 
 def get_latest_data():
     """Get the latest traffic data entry"""
@@ -112,11 +181,17 @@ def build_dashboard_state():
             "EastWest": lane_counts.get("East", 0) + lane_counts.get("West", 0),
         }
         
+        # Phase + timings come from one snapshot published at each phase change,
+        # so they always belong together (and nothing is recomputed per push)
+        snapshot = traffic_controller.get_state_snapshot() if hasattr(traffic_controller, 'get_state_snapshot') else {}
+
         # Get real-time phase from ML system
-        real_current_phase = traffic_controller.current_phase if hasattr(traffic_controller, 'current_phase') else "NorthSouth_Green"
-        
-        # Get signal timings (calculate from current counts - ALWAYS calculate fresh)
-        if hasattr(traffic_controller, 'calculate_green_time'):
+        real_current_phase = snapshot.get("phase") or getattr(traffic_controller, 'current_phase', "NorthSouth_Green")
+
+        # Signal timings chosen for the running cycle
+        if snapshot.get("signal_timings"):
+            signal_timings = snapshot["signal_timings"]
+        elif hasattr(traffic_controller, 'calculate_green_time'):
             signal_timings = traffic_controller.calculate_green_time(real_vehicle_counts)
         else:
             # Fallback: use latest logged or defaults
@@ -133,8 +208,9 @@ def build_dashboard_state():
         
         # Calculate fallback values from phase_start_time
         elapsed = 0.0
-        if hasattr(traffic_controller, "phase_start_time"):
-            elapsed = max(0.0, time.time() - traffic_controller.phase_start_time)
+        phase_start_time = snapshot.get("phase_start_time", getattr(traffic_controller, "phase_start_time", None))
+        if phase_start_time is not None:
+            elapsed = max(0.0, time.monotonic() - phase_start_time)  # controller uses monotonic time
             # Safety check: elapsed shouldn't be unreasonably large (max 60s for any phase)
             if elapsed > 60:
                 elapsed = 0.0  # Reset if stale
@@ -370,79 +446,41 @@ def evp_state():
 # Video Streaming Endpoints
 # ============================================================
 
-@app.route("/api/video/north")
-def video_north():
-    """Stream North lane video with vehicle detections"""
+def _mjpeg_stream(lane):
+    """Multipart MJPEG response for one lane's latest annotated frame"""
     def generate():
+        last = object()
         while True:
-            if traffic_controller and traffic_controller.north_frame_encoded:
-                with traffic_controller.frame_lock:
-                    frame = traffic_controller.north_frame_encoded
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-            else:
-                # Send placeholder if no frame available
+            frame = traffic_controller.get_encoded_frame(lane) if traffic_controller else None
+            # Only send a part when the encoder produced a new JPEG; the
+            # placeholder for a missing frame goes out once
+            if frame is not last:
                 yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + b'' + b'\r\n')
-            import time
+                       b'Content-Type: image/jpeg\r\n\r\n' + (frame or b'') + b'\r\n')
+                last = frame
             time.sleep(0.033)  # ~30 FPS
-    
+
     return Response(generate(), mimetype='multipart/x-mixed-replace; boundary=frame')
 
+@app.route("/api/video/north")
+def video_north():
+    """Stream North lane video with vehicle detections"""
+    return _mjpeg_stream("North")
+
 @app.route("/api/video/east")
 def video_east():
     """Stream East lane video with vehicle detections"""
-    def generate():
-        while True:
-            if traffic_controller and traffic_controller.east_frame_encoded:
-                with traffic_controller.frame_lock:
-                    frame = traffic_controller.east_frame_encoded
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-            else:
-                # Send placeholder if no frame available
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + b'' + b'\r\n')
-            import time
-            time.sleep(0.033)  # ~30 FPS
-    
-    return Response(generate(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    return _mjpeg_stream("East")
 
 @app.route("/api/video/south")
 def video_south():
     """Stream South lane video with vehicle detections"""
-    def generate():
-        while True:
-            if traffic_controller and traffic_controller.south_frame_encoded:
-                with traffic_controller.frame_lock:
-                    frame = traffic_controller.south_frame_encoded
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-            else:
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + b'' + b'\r\n')
-            import time
-            time.sleep(0.033)  # ~30 FPS
-    
-    return Response(generate(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    return _mjpeg_stream("South")
 
 @app.route("/api/video/west")
 def video_west():
     """Stream West lane video with vehicle detections"""
-    def generate():
-        while True:
-            if traffic_controller and traffic_controller.west_frame_encoded:
-                with traffic_controller.frame_lock:
-                    frame = traffic_controller.west_frame_encoded
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + frame + b'\r\n')
-            else:
-                yield (b'--frame\r\n'
-                       b'Content-Type: image/jpeg\r\n\r\n' + b'' + b'\r\n')
-            import time
-            time.sleep(0.033)  # ~30 FPS
-    
-    return Response(generate(), mimetype='multipart/x-mixed-replace; boundary=frame')
+    return _mjpeg_stream("West")
 
 @app.route("/api/video/frames")
 def video_frames():
@@ -457,27 +495,21 @@ def video_frames():
         frames_payload = {}
         counts_payload = {}
         
-        # Safely access encoded_frames with proper locking
-        if hasattr(traffic_controller, 'frame_lock') and hasattr(traffic_controller, 'encoded_frames'):
-            with traffic_controller.frame_lock:
-                encoded_frames = getattr(traffic_controller, 'encoded_frames', {})
-                current_counts = getattr(traffic_controller, 'current_counts', {})
-                
-                for lane in lane_order:
-                    encoded = encoded_frames.get(lane)
-                    if encoded and isinstance(encoded, bytes):
-                        try:
-                            frames_payload[lane.lower()] = base64.b64encode(encoded).decode('utf-8')
-                        except Exception as e:
-                            frames_payload[lane.lower()] = None
-                    else:
-                        frames_payload[lane.lower()] = None
-                    counts_payload[lane.lower()] = current_counts.get(lane, 0)
+        # Snapshot under the controller's lock, base64 outside it so the
+        # encoder threads aren't held up by this request
+        if hasattr(traffic_controller, 'get_encoded_frames'):
+            encoded_frames = traffic_controller.get_encoded_frames()
         else:
-            # Fallback if frame_lock or encoded_frames don't exist
-            for lane in lane_order:
+            encoded_frames = {}
+        current_counts = getattr(traffic_controller, 'current_counts', {})
+
+        for lane in lane_order:
+            encoded = encoded_frames.get(lane)
+            if encoded and isinstance(encoded, bytes):
+                frames_payload[lane.lower()] = base64.b64encode(encoded).decode('utf-8')
+            else:
                 frames_payload[lane.lower()] = None
-                counts_payload[lane.lower()] = getattr(traffic_controller, 'current_counts', {}).get(lane, 0)
+            counts_payload[lane.lower()] = current_counts.get(lane, 0)
 
         return jsonify({
             "frames": frames_payload,
@@ -487,7 +519,6 @@ def video_frames():
     except Exception as e:
         # Return empty frames on any error to prevent 500 errors
         print(f"⚠️ Error in video_frames endpoint: {e}")
-        import traceback
         traceback.print_exc()
         empty_frames = {"north": None, "south": None, "east": None, "west": None}
         empty_counts = {"north": 0, "south": 0, "east": 0, "west": 0}
@@ -497,10 +528,33 @@ def video_frames():
 # WebSocket Updates
 # ============================================================
 
+# Pushes requested within this window collapse into a single "update" frame
+PUSH_COALESCE_WINDOW = 0.1
+_push_event = threading.Event()
+_push_lock = threading.Lock()
+_notifier_thread = None
+
 def push_live_update():
-    """Push newest data to dashboard via WebSocket"""
-    snapshot = build_dashboard_state()
-    socketio.emit("update", snapshot)
+    """Request a dashboard push (non-blocking; coalesced by the notifier thread)"""
+    global _notifier_thread
+    if _notifier_thread is None:
+        with _push_lock:
+            if _notifier_thread is None:
+                _notifier_thread = threading.Thread(target=_notifier_loop, daemon=True)
+                _notifier_thread.start()
+    _push_event.set()
+
+def _notifier_loop():
+    """Emit one snapshot for every burst of push requests"""
+    while True:
+        _push_event.wait()
+        time.sleep(PUSH_COALESCE_WINDOW)  # let the rest of the burst arrive
+        _push_event.clear()
+        try:
+            snapshot = build_dashboard_state()
+            socketio.emit("update", snapshot)
+        except Exception as e:
+            print(f"⚠️ Live update failed: {e}")
 
 # ✅ Exposed for IntelliFlow to call when it logs new cycle data
 @app.route("/notify_update")
@@ -509,6 +563,40 @@ def notify_update():
     push_live_update()
     return jsonify({"status": "ok"})
 
+class _NoDelayRequestHandler(WSGIRequestHandler):
+    """Werkzeug handler that sends small WebSocket/MJPEG writes immediately"""
+
+    def setup(self):
+        super().setup()
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+def run_server(host="0.0.0.0", port=5000, ready=None):
+    """Serve the Flask app + WebSocket on the best available async worker.
+
+    `ready` (a threading.Event) is set once the listening socket is bound. It
+    stays unset if the bind fails, e.g. when a standalone dashboard already
+    owns the port.
+    """
+    # TCP_NODELAY on every connection: live updates are small frames that
+    # Nagle's algorithm would otherwise hold back for up to ~40ms
+    if ASYNC_MODE == "eventlet":
+        # Same as socketio.run() under eventlet, but with our own listener so
+        # the option can be set (accepted sockets inherit it)
+        listener = eventlet.listen((host, port))
+        listener.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        if ready is not None:
+            ready.set()  # connections queue in the backlog from here on
+        eventlet.wsgi.server(listener, app, log_output=False)
+    else:
+        # Threading mode (inside the controller process, or without eventlet):
+        # Werkzeug's threaded server, real OS threads per connection. Same
+        # server socketio.run() starts, but built here so readiness can be
+        # reported once it is bound (make_server raises if the port is taken)
+        server = make_server(host, port, app, threaded=True, request_handler=_NoDelayRequestHandler)
+        if ready is not None:
+            ready.set()
+        server.serve_forever()
+
 @socketio.on("connect")
 def handle_connect():
     """Handle WebSocket connection"""
@@ -522,4 +610,4 @@ if __name__ == "__main__":
     print("\n⚠️  NOTE: If you're running intelliflow_ml.py, Flask server will start automatically.")
     print("⚠️  You don't need to run dashboard.py separately.\n")
     # Change 0.0.0.0 instead of localhost binding
-    socketio.run(app, host="0.0.0.0", port=5000, debug=False, allow_unsafe_werkzeug=True)
+    run_server(host="0.0.0.0", port=5000)
@@ -4,25 +4,180 @@ AI/ML Module for Vehicle Detection, Dynamic Signal Timing & Arduino LED Control
 Updated for 2 video inputs (North and East lanes) with proper traffic light cycling
 """
 
+# No eventlet monkey-patching here: capture, inference, encoding and serial
+# writes block in C code and must run on real OS threads. The in-process
+# dashboard serves SocketIO in threading mode instead.
+
+import os
+# Multi-threaded FFmpeg decode for OpenCV captures (read when a capture is
+# opened, so it must be set before cv2 opens anything; user value wins)
+os.environ.setdefault("OPENCV_FFMPEG_CAPTURE_OPTIONS", "threads;4")
+
 from ultralytics import YOLO
 import cv2
 import numpy as np
-from collections import deque
+from collections import deque, namedtuple
 import time
 import json
 import serial
 from datetime import datetime
 import threading
-import os
+import sched
+import sys
+import queue
+import logging
+import logging.handlers
+from concurrent.futures import ThreadPoolExecutor
+import requests
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:
+    orjson = None
+    _json_loads = json.loads
+
+
+def _put_latest(q, item, release=None):
+    """Put into a size-1 queue, replacing whatever stale item is still there
+
+    Items that are dropped (the displaced one, or this one if the queue is
+    still full) are passed to release so their buffers can be reused.
+    """
+    try:
+        stale = q.get_nowait()
+    except queue.Empty:
+        pass
+    else:
+        if release is not None:
+            release(stale)
+    try:
+        q.put_nowait(item)
+    except queue.Full:
+        if release is not None:
+            release(item)
+
+# Optional GPU preprocessing with NVIDIA DALI (config.USE_DALI); without it
+# Ultralytics letterboxes frames on the CPU as usual
+try:
+    import torch
+    from nvidia.dali import pipeline_def, fn, types
+    from nvidia.dali.plugin.pytorch import feed_ndarray
+    from ultralytics.engine.results import Boxes
+    from ultralytics.utils.ops import scale_boxes
+    DALI_AVAILABLE = torch.cuda.is_available()
+except ImportError:
+    DALI_AVAILABLE = False
+
+if DALI_AVAILABLE:
+    @pipeline_def
+    def _letterbox_pipeline(size):
+        """BGR uint8 HWC frames -> RGB float CHW in [0, 1], letterboxed to size x size"""
+        frames = fn.external_source(name="frames", device="gpu", layout="HWC")
+        frames = fn.color_space_conversion(frames, image_type=types.BGR, output_type=types.RGB)
+        frames = fn.resize(frames, size=[size, size], mode="not_larger")
+        frames = fn.crop(frames, crop=[size, size], crop_pos_x=0.5, crop_pos_y=0.5,
+                         out_of_bounds_policy="pad", fill_values=114)
+        return fn.crop_mirror_normalize(frames, dtype=types.FLOAT, mean=[0.0, 0.0, 0.0],
+                                        std=[255.0, 255.0, 255.0], output_layout="CHW")
+
+# Optional NVDEC decode for video-file lanes (config.USE_NVDEC)
+try:
+    import torch
+    import PyNvVideoCodec as nvc
+    NVDEC_AVAILABLE = torch.cuda.is_available()
+except ImportError:
+    NVDEC_AVAILABLE = False
+
+# Optional nvJPEG encoding of stream frames (config.USE_NVJPEG); needs a
+# torchvision build with CUDA encode_jpeg support (0.19+)
+try:
+    import torch
+    from torchvision.io import encode_jpeg
+    NVJPEG_AVAILABLE = torch.cuda.is_available()
+except ImportError:
+    NVJPEG_AVAILABLE = False
+
+# Detection gets its own CUDA stream when a GPU is present (torch comes with
+# Ultralytics)
+try:
+    import torch
+    CUDA_AVAILABLE = torch.cuda.is_available()
+except ImportError:
+    CUDA_AVAILABLE = False
+
+
+class NvDecCapture:
+    """Minimal cv2.VideoCapture stand-in that decodes a video file on the GPU"""
+
+    def __init__(self, path, gpu_id=0):
+        self._decoder = nvc.SimpleDecoder(path, gpu_id=gpu_id, use_device_memory=True,
+                                          output_color_type=nvc.OutputColorType.RGB)
+        self._fps = self._decoder.get_stream_metadata().average_fps
+
+    def isOpened(self):
+        return self._decoder is not None
+
+    def read(self, image=None):
+        # `image` (OpenCV's reuse buffer) is ignored: frames come off the GPU
+        frames = self._decoder.get_batch_frames(1)
+        if not frames:
+            return False, None
+        # Zero-copy view of the decoded surface; one download for the
+        # CPU-side overlay/JPEG path (RGB -> BGR on the GPU first)
+        rgb = torch.from_dlpack(frames[0])
+        return True, rgb.flip(-1).cpu().numpy()
+
+    def get(self, prop):
+        return self._fps if prop == cv2.CAP_PROP_FPS else 0
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            self._decoder.seek_to_index(int(value))
+            return True
+        return False
+
+    def release(self):
+        self._decoder = None
+
+
+# One signal phase: dashboard name, L1/L2 commands, groups whose countdown
+# runs during it, and its log banner
+PhaseSpec = namedtuple("PhaseSpec", "name l1 l2 countdown_groups banner")
+
+# An announced emergency vehicle, as seen by the signal cycle
+EVStatus = namedtuple("EVStatus", "lane remaining group")
+
+GROUP_LABELS = {"NorthSouth": "North/South", "EastWest": "East/West"}
+
+# The normal cycle as two halves: (group, green, yellow, all-red)
+SIGNAL_CYCLE = (
+    ("NorthSouth",
+     PhaseSpec("NorthSouth_Green", "G", "R", ("NorthSouth",), "\n🟢 Phase 1: North/South GREEN"),
+     PhaseSpec("NorthSouth_Yellow", "Y", "R", ("NorthSouth",), "🟡 Phase 2: North/South YELLOW"),
+     PhaseSpec("All_Red", "R", "R", ("NorthSouth", "EastWest"), "🔴 Phase 3: ALL RED")),
+    ("EastWest",
+     PhaseSpec("EastWest_Green", "R", "G", ("EastWest",), "\n🟢 Phase 4: East/West GREEN"),
+     PhaseSpec("EastWest_Yellow", "R", "Y", ("EastWest",), "🟡 Phase 5: East/West YELLOW"),
+     PhaseSpec("All_Red", "R", "R", ("NorthSouth", "EastWest"), "🔴 Phase 6: ALL RED")),
+)
+
+# The group a critical EV preempts to, for each group's half of the cycle
+OTHER_GROUP = {"NorthSouth": "EastWest", "EastWest": "NorthSouth"}
+
+# Green phases entered directly for an emergency vehicle
+EV_PRIORITY_GREEN = {
+    "NorthSouth": PhaseSpec("NorthSouth_Green", "G", "R", ("NorthSouth",),
+                            "\n🟢 Phase 1 (EV PRIORITY): North/South GREEN"),
+    "EastWest": PhaseSpec("EastWest_Green", "R", "G", ("EastWest",),
+                          "\n🟢 Phase 4 (EV PRIORITY): East/West GREEN"),
+}
 
 
 class TrafficSignalController:
     def __init__(self, model_path="yolov8n.pt", north_camera_url=None, east_camera_url=None):
         """Initialize the traffic signal controller with configurable lane inputs"""
         print("🚀 Starting IntelliFlow System...")
-        print("📦 Loading YOLOv8 model (this may take a minute first time)...")
-        self.model = YOLO(model_path)
-        print("✅ Model loaded successfully!")
 
         # Load configuration
         try:
@@ -32,18 +187,34 @@ class TrafficSignalController:
         except ImportError:
             print("⚠️ config.py not found, using defaults")
             self.config = None
-        
-        self.lane_order = ["North", "South", "East", "West"]
+
+        # Capture/encode already run one thread per lane, so OpenCV's own pool
+        # would only oversubscribe the cores the detector needs (most of all
+        # when inference runs on the CPU)
+        cv2.setUseOptimized(True)
+        cv2.setNumThreads(getattr(self.config, 'OPENCV_THREADS', 2 if CUDA_AVAILABLE else 1))
+
+        self.lane_order = ("North", "South", "East", "West")
         self.system_mode = getattr(self.config, 'SYSTEM_MODE', 'TWO_VIDEO') if self.config else 'TWO_VIDEO'
         self.lane_groups = getattr(self.config, 'LANE_GROUPS', {
             "NorthSouth": ["North", "South"],
             "EastWest": ["East", "West"],
         })
+        # Reverse lookup used for EV lanes
+        self._lane_to_group = {lane: group for group, lanes in self.lane_groups.items() for lane in lanes}
         self.lane_sources = self._initialize_lane_sources(north_camera_url, east_camera_url)
-        self.active_lanes = [lane for lane in self.lane_order if lane in self.lane_sources]
+        self.active_lanes = tuple(lane for lane in self.lane_order if lane in self.lane_sources)
+        self._inactive_lanes = tuple(lane for lane in self.lane_order if lane not in self.active_lanes)
         if not self.active_lanes:
             raise ValueError("❌ No lane sources configured. Please review config.py or constructor parameters.")
 
+        # Model input size; Ultralytics letterboxes each frame down to this and
+        # maps boxes back to frame coordinates, so no manual resize is needed
+        self.IMG_SIZE = getattr(self.config, 'DETECT_IMGSZ', 384)
+        self.model = self._load_model(model_path)
+        self.DETECTION_CONF = getattr(self.config, 'DETECTION_CONFIDENCE', 0.4)
+        self.VEHICLE_CLASSES = getattr(self.config, 'VEHICLE_CLASSES', [2, 3, 5, 7])
+
         # Camera capture storage per lane
         self.captures = {}
 
@@ -58,46 +229,156 @@ class TrafficSignalController:
             self.MAX_GREEN = 40
             self.YELLOW_TIME = 3
             self.ALL_RED_TIME = 2
+        self.EV_CLEAR_MARGIN = 15  # seconds an EV green outlasts the EV's ETA
+        self.EV_CRITICAL_SECONDS = 10  # an EV this close forces its group green
+        self.EV_FALLBACK_POLL = 1.0  # EV file re-check while the in-process dashboard wakes phases
 
         # Vehicle counting per lane
-        self.vehicle_history = {lane: deque(maxlen=10) for lane in self.active_lanes}
+        self.SMOOTHING_WINDOW = 10  # detections averaged per lane
+        self.vehicle_history = {lane: deque(maxlen=self.SMOOTHING_WINDOW) for lane in self.active_lanes}
+        self._history_sums = {lane: 0 for lane in self.active_lanes}  # running sum of each history
         self.current_counts = {lane: 0 for lane in self.lane_order}
         self.group_counts = {"NorthSouth": 0, "EastWest": 0}
         self._update_group_counts()
 
         # Traffic light state
         self.current_phase = "NorthSouth_Green"  # or "EastWest_Green"
-        self.phase_start_time = time.time()
+        self._phase_info = f"Phase: {self.current_phase}"  # overlay text, built once per phase
+        self.phase_start_time = time.monotonic()  # monotonic: immune to wall-clock jumps
         self.current_green_time = self.MIN_GREEN
+        # Green times chosen for the running cycle (fixed until the next cycle)
+        self._current_signal_timings = {"NorthSouth": self.MIN_GREEN, "EastWest": self.MIN_GREEN}
+        self._state_snapshot = {}
+        self.phase_duration = 0  # Planned length of the current phase (seconds)
+        self._phase_deadline = self.phase_start_time  # monotonic end of the current phase
+        self._countdown_groups = ("NorthSouth", "EastWest")  # groups whose countdown tracks the clock
         self.phase_remaining_time = 0  # Remaining time for current phase
         self.phase_remaining_times = {"NorthSouth": 0, "EastWest": 0}
 
         # Emergency detection
         self.emergency_detected = False
         self.emergency_lane = None
+        self._ev_announced = False  # emergency_state.json had active=true on last read
+        self._ev_lane = None  # its lane when announced, so the no-EV check is one load
+        self._evp_cache = (None, {"active": False, "lane": None})  # (file signature, parsed state)
+        # Back-to-back EV checks within this window reuse the cached state
+        # without even a stat(); notify_ev_update() ends the window early
+        self.EVP_STAT_TTL = 0.2
+        self._evp_fresh_until = 0.0
+        # The announced arrival (a wall-clock timestamp in the file) converted
+        # once per file change to a monotonic deadline, so the countdown is
+        # immune to clock adjustments while the EV approaches
+        self._ev_arrival_deadline = 0.0
+        # Wakes a holding phase: set by the in-process dashboard when it
+        # rewrites emergency_state.json (a green re-checks at once instead of
+        # at its next poll) and by stop() (the phase ends immediately)
+        self._phase_wake = threading.Event()
 
         # Statistics
         self.total_vehicles_detected = 0
         self.cycles_completed = 0
-        self.log_data = []
+        self.log_data = deque(maxlen=1000)  # recent entries; full history is in traffic_log.jsonl
+        self._log_fh = open('traffic_log.jsonl', 'ab')
+
+        # Status logging: the controller only enqueues records, a background
+        # listener formats them and writes to stdout
+        self._log_q = queue.Queue(-1)
+        self.log = logging.getLogger("intelliflow")
+        # e.g. LOG_LEVEL = "WARNING" keeps only problems on a production console
+        self.log.setLevel(getattr(self.config, 'LOG_LEVEL', logging.INFO))
+        self.log.propagate = False
+        self.log.addHandler(logging.handlers.QueueHandler(self._log_q))
+        stream_handler = logging.StreamHandler(sys.stdout)
+        stream_handler.setFormatter(logging.Formatter("%(message)s"))
+        self._log_listener = logging.handlers.QueueListener(self._log_q, stream_handler)
+        self._log_listener.start()
+
+        # Dashboard push hook (resolved once in run())
+        self._push = lambda: None
+        self._push_enabled = False
+        # Background worker for the HTTP notify in log_statistics; the session
+        # keeps one connection to the dashboard open across cycles
+        self._notify_pool = ThreadPoolExecutor(max_workers=1)
+        self._notify_session = None
+        self._dashboard_in_process = False
+        # Log lines are serialized and written on their own single worker
+        # (keeps order, and nothing is dropped at shutdown)
+        self._log_pool = ThreadPoolExecutor(max_workers=1)
 
         # Threading for dual video processing
         self.running = False
+        self._shutdown_evt = threading.Event()
+        self._video_thread = None
+        # Latest annotated frame and its JPEG per lane. Frames are pooled
+        # capture buffers: publishing is a reference swap, and the buffer it
+        # replaces goes back to the pool, so readers hold frame_lock
         self.frames = {}
         self.encoded_frames = {}
-        self.north_frame = None
-        self.south_frame = None
-        self.east_frame = None
-        self.west_frame = None
-        self.north_frame_encoded = None
-        self.south_frame_encoded = None
-        self.east_frame_encoded = None
-        self.west_frame_encoded = None
         self.frame_lock = threading.Lock()
+        self._has_display = False
+        self._tile_buf = None
+        self._tile_views = []
+        # Pre-rendered static overlay pieces (lane titles, emergency badge)
+        self._panel_cache = {}
 
         # Video loop support (restart videos when they end)
         self.video_finished_flags = {lane: False for lane in self.active_lanes}
 
+        # One capture thread per lane feeds a size-1 drop-old queue, so the
+        # inference loop always pulls the newest frame and never a backlog
+        self._frame_queues = {lane: queue.Queue(maxsize=1) for lane in self.active_lanes}
+        self._frame_ready = threading.Event()
+        self._capture_threads = []
+        # Working resolution shared by detection, overlays, tiling and JPEG;
+        # every source is brought to this size once, at capture
+        self.FRAME_WIDTH, self.FRAME_HEIGHT = getattr(self.config, 'FRAME_SIZE', (640, 480))
+        # Per-lane pool of preallocated capture buffers. Capture only decodes
+        # into a buffer taken from here, and whoever drops or replaces a frame
+        # (a size-1 queue, or the encoder's swap of self.frames) puts it back
+        self.FRAME_POOL_SIZE = getattr(self.config, 'FRAME_POOL_SIZE', 8)
+        self._free_frames = {}
+        for lane in self.active_lanes:
+            self._free_frames[lane] = queue.Queue()
+            for _ in range(self.FRAME_POOL_SIZE):
+                self._free_frames[lane].put(np.empty((self.FRAME_HEIGHT, self.FRAME_WIDTH, 3), dtype=np.uint8))
+
+        self.JPEG_QUALITY = getattr(self.config, 'STREAM_JPEG_QUALITY', 75)
+        # Baseline Huffman tables: optimized ones cost an extra pass per frame
+        self._jpeg_params = [cv2.IMWRITE_JPEG_QUALITY, self.JPEG_QUALITY, cv2.IMWRITE_JPEG_OPTIMIZE, 0]
+        self._use_nvjpeg = NVJPEG_AVAILABLE and getattr(self.config, 'USE_NVJPEG', False)
+        if self._use_nvjpeg:
+            print("✅ nvJPEG stream encoding enabled")
+
+        # Per-lane output thread input: (frame, boxes, count, phase text); size 1
+        # so a slow annotate/encode drops stale frames
+        self._encode_queues = {lane: queue.Queue(maxsize=1) for lane in self.active_lanes}
+        # Frames are only JPEG-encoded while a dashboard viewer has asked for
+        # one within this many seconds
+        self.STREAM_IDLE_TIMEOUT = 2.0
+        self._last_stream_request = 0.0
+
+        # Run YOLO only on every Nth frame of a lane; N starts at DETECT_EVERY
+        # and stretches up to DETECT_EVERY_MAX while that lane's count is stable
+        self.DETECT_EVERY = max(1, getattr(self.config, 'DETECT_EVERY_N', 5))
+        self.DETECT_EVERY_MAX = max(self.DETECT_EVERY, getattr(self.config, 'DETECT_EVERY_MAX', 15))
+        self._detect_stride = {lane: self.DETECT_EVERY for lane in self.active_lanes}
+        self._detect_countdown = {lane: 0 for lane in self.active_lanes}
+        self._last_raw_counts = {}
+        self._last_boxes = {lane: None for lane in self.active_lanes}
+        self._predictor = None  # Ultralytics predictor, created by the first detection
+        # Non-default stream so inference doesn't queue behind the nvJPEG/NVDEC
+        # work other threads issue on the default stream
+        self._detect_stream = torch.cuda.Stream() if CUDA_AVAILABLE else None
+
+        # GPU letterbox/normalize pipeline (only when DALI + CUDA are present)
+        self._dali_pipe = None
+        self._dali_size = self.IMG_SIZE
+        if DALI_AVAILABLE and getattr(self.config, 'USE_DALI', False):
+            self._dali_pipe = _letterbox_pipeline(self._dali_size, batch_size=len(self.active_lanes),
+                                                  num_threads=2, device_id=0)
+            self._dali_pipe.build()
+            print("✅ DALI GPU preprocessing enabled")
+
         # Arduino Connection Setup (from config or defaults)
         if self.config:
             arduino_port = getattr(self.config, 'ARDUINO_PORT', 'COM5')
@@ -121,7 +402,7 @@ class TrafficSignalController:
                 pass
             
             # Open serial connection
-            self.arduino = serial.Serial(arduino_port, arduino_baud, timeout=1)
+            self.arduino = self._open_arduino(arduino_port, arduino_baud)
             print(f"   Serial port opened, waiting for Arduino to reset...")
             time.sleep(5)  # Increased wait time (like test file) - Arduino needs time to reset
             
@@ -162,10 +443,22 @@ class TrafficSignalController:
             print(f"\n❌ Arduino connection failed: {e}")
             print(f"   Expected port: {arduino_port}, baud rate: {arduino_baud}")
             print("   System will run without hardware control")
-            import traceback
-            traceback.print_exc()
+            self.log.exception("Arduino connection failed")
             self.arduino = None
 
+        # Wire format for every signal command ("L1_G\n" etc.), encoded once
+        self._arduino_cmds = {(lane, color): f"{lane}_{color}\n".encode('ascii')
+                              for lane in ("L1", "L2") for color in ("R", "Y", "G")}
+
+        # Serial writes happen on a dedicated thread fed by this queue
+        # Seconds between consecutive commands; 0 sends each batch in one write
+        self.ARDUINO_CMD_SPACING = getattr(self.config, 'ARDUINO_CMD_SPACING', 0.1)
+        self._arduino_q = queue.Queue(maxsize=64)
+        self._arduino_errors_seen = set()  # exception types already reported by the writer
+        self._serial_lock = threading.Lock()  # guards self.arduino swaps, writes and close
+        self._arduino_thread = threading.Thread(target=self._arduino_writer, daemon=True)
+        self._arduino_thread.start()
+
         print("\n📊 Configuration:")
         print(f"   Min Green Time: {self.MIN_GREEN}s")
         print(f"   Max Green Time: {self.MAX_GREEN}s")
@@ -179,6 +472,49 @@ class TrafficSignalController:
     # =============================================================
     # Helper Functions
     # =============================================================
+    def _load_model(self, model_path):
+        """Load the YOLOv8 detector, building a TensorRT engine first if configured"""
+        # An exported TensorRT/TFLite model can be selected via config.MODEL_PATH;
+        # Ultralytics picks the matching backend from the file extension
+        if self.config:
+            model_path = getattr(self.config, 'MODEL_PATH', model_path)
+        if not os.path.exists(model_path) and model_path != "yolov8n.pt":
+            print(f"⚠️ Model {model_path} not found, falling back to yolov8n.pt")
+            model_path = "yolov8n.pt"
+        if model_path.endswith(".pt") and getattr(self.config, 'EXPORT_TENSORRT', False):
+            model_path = self._export_tensorrt(model_path)
+        print(f"📦 Loading YOLOv8 model {model_path} (this may take a minute first time)...")
+        model = YOLO(model_path, task="detect")
+        print("✅ Model loaded successfully!")
+        return model
+
+    def _export_tensorrt(self, pt_path):
+        """Export pt_path to a TensorRT engine once and return the engine path"""
+        engine_path = os.path.splitext(pt_path)[0] + ".engine"
+        if os.path.exists(engine_path):
+            return engine_path
+        try:
+            import torch
+            if not torch.cuda.is_available():
+                print("⚠️ CUDA not available, using the PyTorch model")
+                return pt_path
+        except ImportError:
+            return pt_path
+
+        # FP16 by default; INT8 when calibration frames from the real cameras
+        # are provided (a dataset yaml, ~200-500 images)
+        calibration = getattr(self.config, 'CALIBRATION_DATA', None)
+        print(f"🔧 Building TensorRT {'INT8' if calibration else 'FP16'} engine (one-time, several minutes)...")
+        try:
+            # dynamic batch up to one frame per lane, since not every lane has
+            # a new frame every iteration
+            return YOLO(pt_path).export(format="engine", half=not calibration, int8=bool(calibration),
+                                        data=calibration, imgsz=self.IMG_SIZE, batch=len(self.active_lanes),
+                                        dynamic=True, device=0, workspace=4)
+        except Exception as e:
+            print(f"⚠️ TensorRT export failed ({e}), using the PyTorch model")
+            return pt_path
+
     def _initialize_lane_sources(self, north_camera_url, east_camera_url):
         """Resolve lane sources from config or legacy constructor parameters."""
         lane_sources = {}
@@ -245,7 +581,11 @@ class TrafficSignalController:
         return resolved
 
     def _update_group_counts(self):
-        """Recompute aggregate counts for North/South and East/West groups."""
+        """Recompute aggregate counts for North/South and East/West groups from scratch.
+
+        Only needed to (re)build the totals; smooth_vehicle_counts keeps them
+        current by applying per-lane deltas.
+        """
         for group, lanes in self.lane_groups.items():
             self.group_counts[group] = sum(self.current_counts.get(lane, 0) for lane in lanes)
 
@@ -253,45 +593,27 @@ class TrafficSignalController:
         """Expose current aggregate counts for API usage."""
         return dict(self.group_counts)
 
+    def _group_totals(self, vehicle_counts):
+        """Per-group totals for a lane->count dict (read-only result)"""
+        if vehicle_counts is self.current_counts:
+            # The detection loop keeps group_counts in step with current_counts
+            return self.group_counts
+        totals = dict.fromkeys(self.lane_groups, 0)
+        for lane, count in vehicle_counts.items():
+            group = self._lane_to_group.get(lane)
+            if group is not None:
+                totals[group] += count
+        return totals
+
     def _update_phase_remaining_times(self):
         """Update remaining time trackers for current phase."""
-        try:
-            elapsed = time.time() - self.phase_start_time
-            signal_timings = self.calculate_green_time(self.current_counts)
-
-            if "Green" in self.current_phase:
-                if "NorthSouth" in self.current_phase:
-                    remaining = max(0, signal_timings.get("NorthSouth", self.MIN_GREEN) - elapsed)
-                    self.phase_remaining_time = remaining
-                    self.phase_remaining_times["NorthSouth"] = remaining
-                    self.phase_remaining_times["EastWest"] = signal_timings.get("EastWest", self.MIN_GREEN)
-                elif "EastWest" in self.current_phase:
-                    remaining = max(0, signal_timings.get("EastWest", self.MIN_GREEN) - elapsed)
-                    self.phase_remaining_time = remaining
-                    self.phase_remaining_times["EastWest"] = remaining
-                    self.phase_remaining_times["NorthSouth"] = signal_timings.get("NorthSouth", self.MIN_GREEN)
-                else:
-                    self.phase_remaining_time = 0
-            elif "Yellow" in self.current_phase:
-                remaining = max(0, self.YELLOW_TIME - elapsed)
-                self.phase_remaining_time = remaining
-                if "NorthSouth" in self.current_phase:
-                    self.phase_remaining_times["NorthSouth"] = remaining
-                    self.phase_remaining_times["EastWest"] = 0
-                else:
-                    self.phase_remaining_times["EastWest"] = remaining
-                    self.phase_remaining_times["NorthSouth"] = 0
-            elif "All_Red" in self.current_phase:
-                remaining = max(0, self.ALL_RED_TIME - elapsed)
-                self.phase_remaining_time = remaining
-                self.phase_remaining_times["NorthSouth"] = remaining
-                self.phase_remaining_times["EastWest"] = remaining
-            else:
-                self.phase_remaining_time = 0
-                self.phase_remaining_times = {"NorthSouth": 0, "EastWest": 0}
-        except Exception:
-            self.phase_remaining_time = 0
-            self.phase_remaining_times = {"NorthSouth": 0, "EastWest": 0}
+        if self.phase_remaining_time == -1:
+            return  # EV hold shows "--" until the phase ends
+        # The other group's value was fixed when the phase started
+        remaining = max(0, self._phase_deadline - time.monotonic())
+        self.phase_remaining_time = remaining
+        for group in self._countdown_groups:
+            self.phase_remaining_times[group] = remaining
 
     def _combine_frames_for_display(self, frames):
         """Create a tiled view for local debugging display."""
@@ -299,20 +621,50 @@ class TrafficSignalController:
             return None
         if len(frames) == 1:
             return frames[0]
-        if len(frames) == 2:
-            return np.hstack(frames)
-
-        padded_frames = list(frames)
-        if len(padded_frames) % 2 != 0:
-            padded_frames.append(np.zeros_like(padded_frames[0]))
 
-        rows = []
-        for idx in range(0, len(padded_frames), 2):
-            rows.append(np.hstack((padded_frames[idx], padded_frames[idx + 1])))
+        # Tile two per row into one buffer that is only reallocated when the
+        # layout changes
+        h, w = frames[0].shape[:2]
+        rows = (len(frames) + 1) // 2
+        shape = (h * rows, w * 2, 3)
+        if self._tile_buf is None or self._tile_buf.shape != shape:
+            self._tile_buf = np.zeros(shape, dtype=np.uint8)
+            # Destination views are built once per layout, not per frame
+            self._tile_views = [self._tile_buf[(i // 2) * h:(i // 2 + 1) * h, (i % 2) * w:(i % 2 + 1) * w]
+                                for i in range(rows * 2)]
+        elif len(frames) % 2:
+            self._tile_views[-1][:] = 0
+        for tile, frame in zip(self._tile_views, frames):
+            if frame.shape == tile.shape:
+                np.copyto(tile, frame)
+            else:
+                # A lane at a different resolution (e.g. a camera that ignored
+                # the FRAME_SIZE request) is scaled into its tile
+                tile[:] = cv2.resize(frame, (w, h))
+        return self._tile_buf
+
+    def _probe_display(self):
+        """Check once whether an OpenCV window can be shown on this host"""
+        if not getattr(self.config, 'SHOW_LOCAL_WINDOW', True):
+            return False
+        if sys.platform.startswith('linux') and not (os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY')):
+            return False
+        try:
+            cv2.namedWindow('IntelliFlow - Traffic Video System')
+            return True
+        except cv2.error:
+            return False
 
-        if len(rows) == 1:
-            return rows[0]
-        return np.vstack(rows)
+    def _open_arduino(self, port, baud):
+        """Open the Arduino serial port with short timeouts for signal commands"""
+        conn = serial.Serial(port, baud, timeout=0.05, write_timeout=0.05)
+        # Linux USB-serial drivers batch transfers every ~16ms unless told not to
+        if hasattr(conn, 'set_low_latency_mode'):
+            try:
+                conn.set_low_latency_mode(True)
+            except (OSError, ValueError):
+                pass
+        return conn
 
     def check_arduino_connection(self):
         """Check if Arduino connection is still valid"""
@@ -324,18 +676,109 @@ class TrafficSignalController:
             return False
     
     def send_signal_to_arduino(self, lane, color):
-        """Send signal command to Arduino (e.g., L1_G, L2_R, etc.)"""
-        if not self.arduino:
+        """Queue a signal command (e.g., L1_G, L2_R) for the Arduino writer thread"""
+        self._enqueue_arduino(((lane, color),))
+
+    def send_signals_to_arduino(self, l1, l2):
+        """Queue both signal heads as one item, so they are always written together"""
+        self._enqueue_arduino((("L1", l1), ("L2", l2)))
+
+    def _enqueue_arduino(self, item):
+        """Put an item on the writer queue, dropping the oldest if it is full"""
+        while True:
+            try:
+                self._arduino_q.put_nowait(item)
+                return
+            except queue.Full:
+                try:
+                    self._arduino_q.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def _arduino_writer(self):
+        """Write queued commands to the Arduino in order, keeping them spaced out.
+
+        Runs on its own thread so the signal FSM never waits on serial I/O; a
+        None item stops the writer once everything before it has been sent.
+        """
+        last_write = 0.0
+        stop = False
+        while not stop:
+            batch = [self._arduino_q.get()]
+            while True:
+                try:
+                    batch.append(self._arduino_q.get_nowait())
+                except queue.Empty:
+                    break
+            if None in batch:
+                stop = True
+                batch = batch[:batch.index(None)]
+
+            # While the port was stalled a lane may have been queued several
+            # states; only its newest one matters (last-queued order is kept)
+            latest = {}
+            for lane, color in (command for item in batch for command in item):
+                latest.pop(lane, None)
+                latest[lane] = color
+
+            if not latest:
+                continue
+            if self.ARDUINO_CMD_SPACING <= 0:
+                # Firmware that buffers whole lines takes the batch (usually
+                # both heads of a phase change) in one write and one flush
+                self._write_arduino_command(*latest.items())
+                continue
+            for command in latest.items():
+                # Give the Arduino time to process the previous command
+                wait = last_write + self.ARDUINO_CMD_SPACING - time.monotonic()
+                if wait > 0:
+                    time.sleep(wait)
+                self._write_arduino_command(command)
+                last_write = time.monotonic()
+
+    def _first_arduino_error(self, exc):
+        """True the first time an Arduino error of this type is seen"""
+        key = type(exc).__name__
+        if key in self._arduino_errors_seen:
+            return False
+        self._arduino_errors_seen.add(key)
+        return True
+
+    @staticmethod
+    def _describe_commands(commands):
+        """Human-readable form of (lane, color) commands for log messages"""
+        return ", ".join(f"{lane}_{color}" for lane, color in commands)
+
+    def _close_arduino(self, arduino):
+        """Close a failed port and forget it, unless it was already replaced"""
+        with self._serial_lock:
+            try:
+                arduino.close()
+            except:
+                pass
+            if self.arduino is arduino:
+                self.arduino = None
+
+    def _write_arduino_command(self, *commands):
+        """Send (lane, color) signal commands to Arduino (e.g., L1_G, L2_R, etc.)
+
+        _serial_lock is only held around the port I/O itself; the reconnect and
+        its reset wait run without it so shutdown's close() is never stuck
+        behind them.
+        """
+        arduino = self.arduino
+        if not arduino:
             # Only print warning once per phase to avoid spam
             if not hasattr(self, '_arduino_warning_printed'):
-                print("⚠️ Arduino not connected - commands will not be sent")
+                self.log.warning("⚠️ Arduino not connected - commands will not be sent")
                 self._arduino_warning_printed = True
             return
         
         try:
             # Check if serial port is still open
-            if not self.arduino.is_open:
-                print("⚠️ Arduino port closed, attempting to reconnect...")
+            if not arduino.is_open:
+                self.log.warning("⚠️ Arduino port closed, attempting to reconnect...")
+                reopened = None
                 try:
                     if self.config:
                         arduino_port = getattr(self.config, 'ARDUINO_PORT', 'COM5')
@@ -346,63 +789,65 @@ class TrafficSignalController:
                     
                     # Close old connection if it exists
                     try:
-                        self.arduino.close()
+                        arduino.close()
                     except:
                         pass
                     
                     # Reopen connection
-                    self.arduino = serial.Serial(arduino_port, arduino_baud, timeout=1)
+                    reopened = self._open_arduino(arduino_port, arduino_baud)
                     time.sleep(2)  # Wait for Arduino to reset
-                    self.arduino.reset_input_buffer()
-                    self.arduino.reset_output_buffer()
-                    print(f"✅ Reconnected to Arduino ({arduino_port})")
+                    reopened.reset_input_buffer()
+                    reopened.reset_output_buffer()
                 except Exception as reconnect_error:
-                    print(f"❌ Failed to reconnect: {reconnect_error}")
-                    self.arduino = None
+                    self.log.error("❌ Failed to reconnect: %s", reconnect_error)
+                    if reopened is not None:
+                        self._close_arduino(reopened)
+                    self._close_arduino(arduino)
                     return
-            
-            # Flush input buffer (clear any pending data)
-            if self.arduino.in_waiting > 0:
-                self.arduino.reset_input_buffer()
+                with self._serial_lock:
+                    # Shutdown closed the port while we were reconnecting
+                    if self.arduino is not arduino:
+                        reopened.close()
+                        return
+                    self.arduino = arduino = reopened
+                self.log.info("✅ Reconnected to Arduino (%s)", arduino_port)
             
             # Send command (same format as test file)
-            cmd = f"{lane}_{color}\n"
-            cmd_bytes = cmd.encode('utf-8')
+            cmd_bytes = b"".join(self._arduino_cmds[command] for command in commands)
             
-            # Write command
-            bytes_written = self.arduino.write(cmd_bytes)
-            self.arduino.flush()  # Ensure data is sent immediately
+            with self._serial_lock:
+                # Shutdown closed the port since we picked it up
+                if self.arduino is not arduino:
+                    return
+                
+                # Flush input buffer (clear any pending data)
+                if arduino.in_waiting > 0:
+                    arduino.reset_input_buffer()
+                
+                # Write command
+                bytes_written = arduino.write(cmd_bytes)
+                arduino.flush()  # Ensure data is sent immediately
             
             # Verify command was written
             if bytes_written != len(cmd_bytes):
-                print(f"⚠️ Warning: Only {bytes_written} bytes written, expected {len(cmd_bytes)}")
-            
-            # Small delay to ensure command is processed by Arduino
-            time.sleep(0.1)
+                self.log.warning("⚠️ Warning: Only %s bytes written, expected %s", bytes_written, len(cmd_bytes))
             
             # Print confirmation (only for important state changes to reduce spam)
-            if color in ['G', 'R']:  # Only log Green and Red (not Yellow to reduce spam)
-                print(f"➡️ Arduino: {cmd.strip()} ({bytes_written} bytes sent)")
+            for lane, color in commands:
+                if color in ['G', 'R']:  # Only log Green and Red (not Yellow to reduce spam)
+                    self.log.info("➡️ Arduino: %s_%s (%s bytes sent)", lane, color, bytes_written)
             
         except serial.SerialException as e:
-            print(f"❌ Serial error sending to Arduino: {e}")
-            print(f"   Command was: {lane}_{color}")
-            try:
-                self.arduino.close()
-            except:
-                pass
-            self.arduino = None
+            # An unplugged cable fails every command; report each error type once
+            if self._first_arduino_error(e):
+                self.log.error("❌ Serial error sending to Arduino: %s (command was %s)", e,
+                               self._describe_commands(commands))
+            self._close_arduino(arduino)
         except Exception as e:
-            print(f"❌ Failed to send to Arduino: {e}")
-            print(f"   Command was: {lane}_{color}")
-            import traceback
-            traceback.print_exc()
-            try:
-                if self.arduino:
-                    self.arduino.close()
-            except:
-                pass
-            self.arduino = None
+            if self._first_arduino_error(e):
+                self.log.exception("❌ Failed to send to Arduino (command was %s)",
+                                   self._describe_commands(commands))
+            self._close_arduino(arduino)
 
     def connect_cameras(self):
         """Connect to configured cameras for all active lanes"""
@@ -412,58 +857,304 @@ class TrafficSignalController:
             source_arg = lane_source["open_arg"]
             print(f"   {lane} Lane: {source_arg}")
 
-            cap = cv2.VideoCapture(source_arg)
+            cap = None
+            if lane_source["is_video_file"] and NVDEC_AVAILABLE and getattr(self.config, 'USE_NVDEC', False):
+                cap = NvDecCapture(source_arg)
+            elif getattr(self.config, 'USE_GSTREAMER', False) and (
+                    lane_source["type"] in ("ip", "esp32")
+                    or (lane_source["is_video_file"] and getattr(self.config, 'GSTREAMER_HW_DECODER', None))):
+                # appsink keeps at most one frame and drops the rest, so network
+                # streams can't build up latency inside the FFmpeg backend
+                cap = cv2.VideoCapture(self._gstreamer_pipeline(source_arg), cv2.CAP_GSTREAMER)
+                if not cap.isOpened():
+                    print(f"⚠️ GStreamer pipeline failed for {lane}, using default backend")
+                    cap = None
+            if cap is None and lane_source["is_video_file"] and hasattr(cv2, 'VIDEO_ACCELERATION_ANY'):
+                # Let FFmpeg use whatever hardware decoder it finds (VAAPI,
+                # D3D11, ...); it falls back to software on its own
+                cap = cv2.VideoCapture(source_arg, cv2.CAP_FFMPEG,
+                                       [cv2.CAP_PROP_HW_ACCELERATION, cv2.VIDEO_ACCELERATION_ANY])
+                if not cap.isOpened():
+                    cap = None
+            if cap is None:
+                cap = cv2.VideoCapture(source_arg)
             if not cap.isOpened():
                 raise Exception(f"❌ Failed to connect to {lane} camera: {source_arg}")
 
             # Standardize frame size for layout consistency
-            cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+            cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.FRAME_WIDTH)
+            cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.FRAME_HEIGHT)
+            # Don't let the driver queue up stale frames behind the newest one
+            cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
             self.captures[lane] = cap
             print(f"✅ {lane} camera connected!")
         return True
 
-    def detect_vehicles(self, frame):
-        """Detect vehicles using YOLOv8"""
-        if self.config:
-            conf = getattr(self.config, 'DETECTION_CONFIDENCE', 0.4)
-            classes = getattr(self.config, 'VEHICLE_CLASSES', [2, 3, 5, 7])
+    def _gstreamer_pipeline(self, url):
+        """Low-latency GStreamer pipeline for an RTSP/file (H.264) or HTTP MJPEG stream"""
+        decoder = getattr(self.config, 'GSTREAMER_HW_DECODER', None)
+        size = f"width={self.FRAME_WIDTH},height={self.FRAME_HEIGHT}"
+        if url.startswith("rtsp://"):
+            source = f"rtspsrc location={url} latency=0 ! rtph264depay ! h264parse ! {decoder or 'avdec_h264'}"
+        elif url.startswith(("http://", "https://")):
+            source = f"souphttpsrc location={url} is-live=true ! multipartdemux ! jpegdec"
         else:
-            conf = 0.4
-            classes = [2, 3, 5, 7]
-        results = self.model(frame, conf=conf, classes=classes, verbose=False)
-        return results[0].boxes
+            source = f"filesrc location={url} ! qtdemux ! h264parse ! {decoder or 'avdec_h264'}"
+
+        if decoder == "nvv4l2decoder":
+            # Jetson: scale in NVMM memory, only the final small BGR copy touches the CPU
+            return (f"{source} ! nvvidconv ! video/x-raw,format=BGRx,{size} "
+                    "! videoconvert ! video/x-raw,format=BGR ! appsink drop=true max-buffers=1 sync=false")
+        return (f"{source} ! videoconvert ! videoscale ! video/x-raw,format=BGR,{size} "
+                "! appsink drop=true max-buffers=1 sync=false")
+
+    def _capture_loop(self, lane):
+        """Read one lane continuously, keeping only the most recent frame"""
+        cap = self.captures[lane]
+        is_video_file = self.lane_sources[lane].get("is_video_file")
+        # Video files would otherwise decode as fast as possible; play them at
+        # their native frame rate like a live camera
+        frame_period = 0
+        if is_video_file:
+            fps = cap.get(cv2.CAP_PROP_FPS)
+            frame_period = 1.0 / fps if fps and fps > 0 else 0.033
+
+        # Decode into pooled buffers instead of a fresh array per frame. A
+        # buffer is only reused after its consumer returns it, so a slow
+        # inference or encode makes capture wait here instead of overwriting a
+        # frame that is still being detected, drawn on or encoded
+        free = self._free_frames[lane]
+        release = lambda frame: self._release_frame(lane, frame)
+        next_deadline = time.monotonic()
+
+        while self.running:
+            try:
+                slot = free.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            ret, frame = cap.read(slot)
+            if not ret and is_video_file:
+                if not self.video_finished_flags.get(lane, False):
+                    print(f"🔄 {lane} video ended, restarting...")
+                    self.video_finished_flags[lane] = True
+                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                ret, frame = cap.read(slot)
+                if ret:
+                    self.video_finished_flags[lane] = False
+
+            if not ret:
+                free.put(slot)
+                self._shutdown_evt.wait(0.1)
+                continue
+
+            # Sources that ignore the FRAME_SIZE request (video files, some IP
+            # cameras) are downscaled once here, into the slot, so detection,
+            # overlay, tiling and JPEG all work on the small frame. Readers
+            # that return their own array (NVDEC) are copied in so that only
+            # pooled buffers travel downstream.
+            if frame.shape != slot.shape:
+                frame = cv2.resize(frame, (slot.shape[1], slot.shape[0]), dst=slot,
+                                   interpolation=cv2.INTER_AREA)
+            elif frame is not slot:
+                np.copyto(slot, frame)
+                frame = slot
+
+            _put_latest(self._frame_queues[lane], frame, release)
+            self._frame_ready.set()
+
+            if frame_period:
+                # Sleep to an absolute deadline so decode time doesn't stretch
+                # the period; after an overrun, resync instead of bursting
+                next_deadline += frame_period
+                delay = next_deadline - time.monotonic()
+                if delay > 0:
+                    self._shutdown_evt.wait(delay)
+                else:
+                    next_deadline = time.monotonic()
+
+    def _release_frame(self, lane, frame):
+        """Return a dropped or replaced frame's buffer to its lane's pool"""
+        self._free_frames[lane].put(frame)
 
-    def count_vehicles_in_frame(self, boxes, frame, lane_name):
+    def _encode_loop(self, lane):
+        """Annotate one lane's frames and JPEG-encode them for the MJPEG/API endpoints"""
+        frames = self._encode_queues[lane]
+        while self.running:
+            try:
+                frame, boxes, vehicle_count, phase_info = frames.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+            # Boxes and overlays are only drawn when someone can see them
+            # (local window or a recent MJPEG/frames request)
+            if self._has_viewer():
+                self.count_vehicles_in_frame(boxes, frame, lane)
+                frame = self.draw_info_panel(frame, lane.upper(), vehicle_count, phase_info)
+                cv2.putText(frame, f"{lane} Lane - Vehicles: {vehicle_count}", (10, 30),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
+            # The frame stays published until the next one replaces it, so the
+            # encode below reads a buffer capture can't reuse yet
+            with self.frame_lock:
+                previous = self.frames.get(lane)
+                self.frames[lane] = frame
+                if previous is not None and previous is not frame:
+                    self._release_frame(lane, previous)
+
+            # Nobody is watching: skip the JPEG work until a viewer asks again
+            if time.monotonic() - self._last_stream_request > self.STREAM_IDLE_TIMEOUT:
+                continue
+            encoded = self._encode_jpeg(frame)
+            if encoded is None:
+                continue
+            with self.frame_lock:
+                self.encoded_frames[lane] = encoded
+
+    def _has_viewer(self):
+        """True while the local window is open or a client pulled a frame recently"""
+        return self._has_display or time.monotonic() - self._last_stream_request <= self.STREAM_IDLE_TIMEOUT
+
+    def get_encoded_frame(self, lane):
+        """Latest JPEG bytes for a lane (None until the first frame is encoded)"""
+        self._last_stream_request = time.monotonic()
+        with self.frame_lock:
+            return self.encoded_frames.get(lane)
+
+    def get_encoded_frames(self):
+        """Snapshot of every lane's latest JPEG bytes (the bytes are never mutated)"""
+        self._last_stream_request = time.monotonic()
+        with self.frame_lock:
+            return dict(self.encoded_frames)
+
+    def get_frame(self, lane):
+        """Latest annotated BGR frame for in-process consumers (no JPEG round trip)"""
+        # self.frames holds pooled capture buffers that return to the pool as
+        # soon as they are replaced; copy under the lock so callers keep a
+        # stable image
+        with self.frame_lock:
+            frame = self.frames.get(lane)
+            return None if frame is None else frame.copy()
+
+    def _encode_jpeg(self, frame):
+        """Encode a BGR frame to JPEG bytes (nvJPEG when enabled, else libjpeg)"""
+        if self._use_nvjpeg:
+            # Upload once, convert to RGB CHW on the device; only the compressed
+            # bytes come back over PCIe
+            gpu = torch.from_numpy(frame).cuda(non_blocking=True).flip(-1).permute(2, 0, 1)
+            return encode_jpeg(gpu.contiguous(), quality=self.JPEG_QUALITY).cpu().numpy().tobytes()
+        success, buffer = cv2.imencode('.jpg', frame, self._jpeg_params)
+        return buffer.tobytes() if success else None
+
+    def detect_vehicles(self, frames_by_lane):
+        """Detect vehicles in all lane frames with a single batched YOLOv8 pass"""
+        if not frames_by_lane:
+            return {}
+        if self._detect_stream is None:
+            return self._detect_batch(frames_by_lane)
+        with torch.cuda.stream(self._detect_stream):
+            boxes = self._detect_batch(frames_by_lane)
+            done = torch.cuda.Event()
+            done.record()
+        # GPU-side ordering only: later box reads on this thread's default
+        # stream wait for inference without blocking the CPU here
+        torch.cuda.current_stream().wait_event(done)
+        return boxes
+
+    def _detect_batch(self, frames_by_lane):
+        """Batched detection on the current CUDA stream, boxes keyed by lane"""
+        lanes = list(frames_by_lane)
+        frames = [frames_by_lane[lane] for lane in lanes]
+        if self._dali_pipe is not None:
+            batch = self._preprocess_on_gpu(frames)
+            results = self._predict(batch)
+            return {lane: self._unletterbox_boxes(result.boxes, batch.shape[2:], frame.shape)
+                    for lane, result, frame in zip(lanes, results, frames)}
+        # A list input is letterboxed and stacked into one NCHW batch by
+        # Ultralytics; boxes come back scaled to each original frame
+        results = self._predict(frames)
+        return {lane: result.boxes for lane, result in zip(lanes, results)}
+
+    def _predict(self, source):
+        """Run the detector, calling the cached Ultralytics predictor directly"""
+        if self._predictor is None:
+            # First call builds the predictor (and warms up the backend) with
+            # the fixed detection settings
+            results = self.model.predict(source, imgsz=self.IMG_SIZE, conf=self.DETECTION_CONF,
+                                         classes=self.VEHICLE_CLASSES, verbose=False)
+            self._predictor = self.model.predictor
+            return results
+        # Later calls skip YOLO.predict's per-call argument merging and
+        # predictor checks; the settings never change at runtime
+        return self._predictor(source)
+
+    def _preprocess_on_gpu(self, frames):
+        """Letterbox + normalize a batch of BGR frames on the GPU with DALI"""
+        self._dali_pipe.feed_input("frames", frames)
+        (output,) = self._dali_pipe.run()
+        output = output.as_tensor()
+        batch = torch.empty(output.shape(), dtype=torch.float32, device="cuda")
+        feed_ndarray(output, batch, cuda_stream=torch.cuda.current_stream())
+        return batch
+
+    def _unletterbox_boxes(self, boxes, input_shape, frame_shape):
+        """Map boxes from the letterboxed model input back to frame coordinates"""
+        data = boxes.data.clone()
+        scale_boxes(input_shape, data[:, :4], frame_shape)
+        return Boxes(data, frame_shape[:2])
+
+    def count_vehicles_in_frame(self, boxes, frame, lane_name, draw=True):
         """Count vehicles in entire frame (detect ALL vehicles, not just specific regions)"""
-        if boxes is None or len(boxes.xyxy) == 0:
-            return 0
-        
-        vehicle_count = len(boxes.xyxy)
-        # Draw bounding boxes on ALL detected vehicles in the entire frame
-        for i, box in enumerate(boxes.xyxy):
-            x1, y1, x2, y2 = map(int, box)
-            # Draw green bounding box
+        count = 0 if boxes is None else len(boxes)
+        if not draw or count == 0:
+            return count
+
+        # Cast on the device and copy only the int32 corners to the host in one
+        # go (not the whole conf/cls data, and no per-box tensor indexing)
+        xyxy = boxes.xyxy
+        if isinstance(xyxy, np.ndarray):
+            xyxy = xyxy.astype(np.int32)
+        else:
+            xyxy = xyxy.int().cpu().numpy()
+        # Draw green bounding boxes on ALL detected vehicles in the entire frame
+        # (the lane total is shown in the header and info panel)
+        for x1, y1, x2, y2 in xyxy.tolist():
             cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 0), 2)
-            # Add vehicle label with count
-            label = f"Vehicle {i+1}"
-            cv2.putText(frame, label, (x1, y1 - 10),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
-        return vehicle_count
+        return count
+
+    def _adapt_detect_stride(self, lane, count):
+        """Detect a steady lane less often; go back to DETECT_EVERY once its count moves"""
+        previous = self._last_raw_counts.get(lane)
+        self._last_raw_counts[lane] = count
+        if previous is not None and abs(count - previous) <= 1:
+            stride = min(self.DETECT_EVERY_MAX, self._detect_stride[lane] + 1)
+        else:
+            stride = self.DETECT_EVERY
+        self._detect_stride[lane] = stride
+        self._detect_countdown[lane] = stride
 
     def smooth_vehicle_counts(self, latest_counts):
-        """Apply temporal smoothing to vehicle counts for all active lanes"""
-        smoothed = {}
-        for lane in self.active_lanes:
-            history = self.vehicle_history.setdefault(lane, deque(maxlen=10))
-            value = latest_counts.get(lane, 0)
-            history.append(value)
-            smoothed[lane] = int(np.mean(history)) if history else 0
+        """Apply temporal smoothing to vehicle counts for all active lanes (updates current/group counts)"""
+        # Lanes without a new detection this round keep their smoothed count
+        smoothed = {lane: self.current_counts.get(lane, 0) for lane in self.active_lanes}
+        for lane, count in latest_counts.items():
+            history = self.vehicle_history.setdefault(lane, deque(maxlen=self.SMOOTHING_WINDOW))
+            total = self._history_sums.get(lane, 0)
+            if len(history) == history.maxlen:
+                total -= history[0]
+            history.append(count)
+            self._history_sums[lane] = total + count
+            smoothed[lane] = value = (total + count) // len(history)
+
+            # Keep current/group counts in step by applying only the change
+            delta = value - self.current_counts.get(lane, 0)
+            if delta:
+                self.current_counts[lane] = value
+                group = self._lane_to_group.get(lane)
+                if group is not None:
+                    self.group_counts[group] = self.group_counts.get(group, 0) + delta
 
         # Ensure inactive lanes remain zero
-        for lane in self.lane_order:
-            if lane not in smoothed:
-                smoothed[lane] = 0
+        for lane in self._inactive_lanes:
+            smoothed[lane] = 0
 
         return smoothed
 
@@ -476,49 +1167,36 @@ class TrafficSignalController:
         If EV is active, calculates when EV lane MUST be green and plans accordingly.
         """
         # Check for Emergency Vehicle Preemption state
-        evp_state = self._load_evp_state()
-        
-        # Calculate normal green times first (without EV consideration)
-        north_group = sum(vehicle_counts.get(lane, 0) for lane in self.lane_groups.get("NorthSouth", []))
-        east_group = sum(vehicle_counts.get(lane, 0) for lane in self.lane_groups.get("EastWest", []))
-        total_vehicles = north_group + east_group
+        ev = self._ev_status()
         
-        if total_vehicles == 0:
-            base_north = self.MIN_GREEN
-            base_east = self.MIN_GREEN
-        else:
-            if north_group > east_group:
-                base_north = min(self.MAX_GREEN, max(self.MIN_GREEN, north_group * 2))
-                base_east = min(self.MAX_GREEN, max(self.MIN_GREEN, east_group * 2))
-            elif east_group > north_group:
-                base_east = min(self.MAX_GREEN, max(self.MIN_GREEN, east_group * 2))
-                base_north = min(self.MAX_GREEN, max(self.MIN_GREEN, north_group * 2))
-            else:
-                green_time = min(self.MAX_GREEN, max(self.MIN_GREEN, total_vehicles))
-                base_north = green_time
-                base_east = green_time
-        
-        # If no EV active, return normal times
-        if not evp_state.get("active") or not evp_state.get("lane"):
-            return {"NorthSouth": int(base_north), "EastWest": int(base_east)}
-        
-        ev_lane = evp_state["lane"]
-        expected_arrival = evp_state.get("expected_arrival_ts", 0)
-        ev_remaining = max(0, expected_arrival - time.time())
-        
-        # Determine which group the EV is coming from
-        ev_group = None
-        if ev_lane in self.lane_groups.get("NorthSouth", []):
-            ev_group = "NorthSouth"
-        elif ev_lane in self.lane_groups.get("EastWest", []):
-            ev_group = "EastWest"
+        group_totals = self._group_totals(vehicle_counts)
+        north_group = group_totals.get("NorthSouth", 0)
+        east_group = group_totals.get("EastWest", 0)
+
+        # No EV active (the usual case): normal times only
+        if ev is None:
+            return self._green_time_normal(north_group, east_group)
+        return self._green_time_evp(ev, north_group, east_group, current_phase, phase_elapsed)
+
+    def _green_time_normal(self, north_group, east_group):
+        """Green time per group from vehicle counts alone: 2s per vehicle, clamped"""
+        return {
+            "NorthSouth": int(min(self.MAX_GREEN, max(self.MIN_GREEN, north_group * 2))),
+            "EastWest": int(min(self.MAX_GREEN, max(self.MIN_GREEN, east_group * 2))),
+        }
+
+    def _green_time_evp(self, ev, north_group, east_group, current_phase, phase_elapsed):
+        """Green times planned around an announced emergency vehicle (an EVStatus)"""
+        normal = self._green_time_normal(north_group, east_group)
+
+        ev_remaining = ev.remaining
+        ev_group = ev.group  # the group the EV is coming from
         
         if not ev_group or ev_remaining <= 0:
-            return {"NorthSouth": int(base_north), "EastWest": int(base_east)}
+            return normal
         
         # PREDICTIVE LOGIC: Calculate when EV lane MUST be green
-        MANDATORY_GREEN_THRESHOLD = 10  # EV lane must be green when <10s away
-        must_be_green_at = ev_remaining - MANDATORY_GREEN_THRESHOLD
+        must_be_green_at = ev_remaining - self.EV_CRITICAL_SECONDS  # EV lane must be green by then
         
         # Get current phase info if available
         if current_phase is None:
@@ -534,124 +1212,109 @@ class TrafficSignalController:
         # Calculate how much time current phase has remaining
         # This is CRITICAL - we NEVER cut this time
         if current_phase and hasattr(self, 'phase_start_time'):
-            phase_elapsed = time.time() - self.phase_start_time
+            phase_elapsed = time.monotonic() - self.phase_start_time
         
         # If we're in a green phase, estimate remaining time
         current_phase_remaining = 0
-        if "Green" in current_phase:
+        if "Green" in current_phase and current_group:
             # Estimate remaining based on signal timings
-            if current_group == "NorthSouth":
-                current_phase_remaining = max(0, base_north - phase_elapsed)
-            elif current_group == "EastWest":
-                current_phase_remaining = max(0, base_east - phase_elapsed)
+            current_phase_remaining = max(0, normal[current_group] - phase_elapsed)
         
         # Add yellow and all-red time to get total time until next phase can start
         time_until_next_phase = current_phase_remaining
         if "Green" in current_phase:
             time_until_next_phase += self.YELLOW_TIME + self.ALL_RED_TIME
         
-        # PREDICTIVE CALCULATION
-        if ev_group == "NorthSouth":
-            # EV coming from North/South
-            if current_group == "NorthSouth" and "Green" in current_phase:
-                # EV lane is currently green - extend it to cover EV arrival
-                # Calculate how long it needs to stay green
-                vehicles_in_ev_lane = north_group
-                clearing_time = max(20, vehicles_in_ev_lane * 2)  # Time to clear vehicles
-                needed_duration = max(
-                    int(ev_remaining + 10),  # Stay green until EV passes + buffer
-                    clearing_time,  # Or enough to clear vehicles
-                    base_north  # Or at least normal time
-                )
-                return {
-                    "NorthSouth": int(min(self.MAX_GREEN, needed_duration)),
-                    "EastWest": int(self.MIN_GREEN)  # Non-EV lane gets minimal time next
-                }
-            elif current_group == "EastWest" and "Green" in current_phase:
-                # Non-EV lane is green - let it finish, but limit next green time
-                # Check if we have time for East/West to finish + transition
-                if time_until_next_phase <= must_be_green_at - 15:
-                    # We have time - let East/West finish, then give North/South enough time
-                    return {
-                        "NorthSouth": int(min(self.MAX_GREEN, max(base_north, int(ev_remaining + 10)))),
-                        "EastWest": int(base_east)  # Let current green finish normally
-                    }
-                else:
-                    # Not enough time - limit East/West to minimum after current finishes
-                    return {
-                        "NorthSouth": int(min(self.MAX_GREEN, max(base_north, int(ev_remaining + 10)))),
-                        "EastWest": int(self.MIN_GREEN)
-                    }
-            else:
-                # Not in green phase - can start EV lane green immediately
-                vehicles_in_ev_lane = north_group
-                clearing_time = max(20, vehicles_in_ev_lane * 2)
-                needed_duration = max(
-                    int(ev_remaining + 10),
-                    clearing_time,
-                    base_north
-                )
-                return {
-                    "NorthSouth": int(min(self.MAX_GREEN, needed_duration)),
-                    "EastWest": int(self.MIN_GREEN)
-                }
-        else:
-            # EV coming from East/West (same logic, reversed)
-            if current_group == "EastWest" and "Green" in current_phase:
-                # EV lane is currently green - extend it
-                vehicles_in_ev_lane = east_group
-                clearing_time = max(20, vehicles_in_ev_lane * 2)
-                needed_duration = max(
-                    int(ev_remaining + 10),
-                    clearing_time,
-                    base_east
-                )
-                return {
-                    "NorthSouth": int(self.MIN_GREEN),
-                    "EastWest": int(min(self.MAX_GREEN, needed_duration))
-                }
-            elif current_group == "NorthSouth" and "Green" in current_phase:
-                # Non-EV lane is green - let it finish, but limit next green time
-                if time_until_next_phase <= must_be_green_at - 15:
-                    return {
-                        "NorthSouth": int(base_north),  # Let current green finish normally
-                        "EastWest": int(min(self.MAX_GREEN, max(base_east, int(ev_remaining + 10))))
-                    }
-                else:
-                    return {
-                        "NorthSouth": int(self.MIN_GREEN),
-                        "EastWest": int(min(self.MAX_GREEN, max(base_east, int(ev_remaining + 10))))
-                    }
-            else:
-                # Not in green phase - can start EV lane green immediately
-                vehicles_in_ev_lane = east_group
-                clearing_time = max(20, vehicles_in_ev_lane * 2)
-                needed_duration = max(
-                    int(ev_remaining + 10),
-                    clearing_time,
-                    base_east
-                )
-                return {
-                    "NorthSouth": int(self.MIN_GREEN),
-                    "EastWest": int(min(self.MAX_GREEN, needed_duration))
-                }
-    
+        # PREDICTIVE CALCULATION (same rules whichever group the EV comes from)
+        other_group = OTHER_GROUP[ev_group]
+        vehicles = {"NorthSouth": north_group, "EastWest": east_group}
+        ev_green = int(min(self.MAX_GREEN, max(normal[ev_group], int(ev_remaining + 10))))
+
+        if current_group == other_group and "Green" in current_phase:
+            # Non-EV lane is green - let it finish, but limit next green time
+            # Check if we have time for it to finish + transition
+            if time_until_next_phase <= must_be_green_at - 15:
+                # We have time - let it finish normally, then give the EV lane enough time
+                return {ev_group: ev_green, other_group: int(normal[other_group])}
+            # Not enough time - limit the non-EV lane to minimum after current finishes
+            return {ev_group: ev_green, other_group: int(self.MIN_GREEN)}
+
+        # EV lane is currently green (extend it to cover EV arrival), or not in
+        # a green phase (can start EV lane green immediately)
+        clearing_time = max(20, vehicles[ev_group] * 2)  # Time to clear vehicles
+        needed_duration = max(
+            int(ev_remaining + 10),  # Stay green until EV passes + buffer
+            clearing_time,  # Or enough to clear vehicles
+            normal[ev_group]  # Or at least normal time
+        )
+        return {
+            ev_group: int(min(self.MAX_GREEN, needed_duration)),
+            other_group: int(self.MIN_GREEN)  # Non-EV lane gets minimal time next
+        }
+
     def _load_evp_state(self):
         """Load emergency vehicle preemption state from JSON file"""
+        now = time.monotonic()
+        if now < self._evp_fresh_until:
+            return self._evp_cache[1]
+        self._evp_fresh_until = now + self.EVP_STAT_TTL
         ev_state_file = "emergency_state.json"
-        if not os.path.exists(ev_state_file):
-            return {"active": False, "lane": None}
         try:
-            with open(ev_state_file, "r") as f:
-                return json.load(f)
-        except (json.JSONDecodeError, IOError):
-            return {"active": False, "lane": None}
+            st = os.stat(ev_state_file)
+        except OSError:
+            state = {"active": False, "lane": None}
+            self._evp_cache = (None, state)
+            self._ev_announced = False
+            self._ev_lane = None
+            return state
+
+        # The file only changes when an EV is reported; reuse the last parse
+        # until it does. Writers replace it atomically, so the inode changes
+        # on every write even where mtime is coarse and the size is the same
+        signature = (st.st_ino, st.st_mtime_ns, st.st_size)
+        cached_signature, state = self._evp_cache
+        if signature != cached_signature:
+            try:
+                with open(ev_state_file, "rb") as f:
+                    state = _json_loads(f.read())
+                self._evp_cache = (signature, state)
+                arrival_ts = state.get("expected_arrival_ts") or 0
+                self._ev_arrival_deadline = time.monotonic() + (arrival_ts - time.time())
+            except (json.JSONDecodeError, IOError):
+                # Caught mid-write: keep the previous state and retry next call
+                pass
+        self._ev_announced = bool(state.get("active"))
+        self._ev_lane = state.get("lane") if self._ev_announced else None
+        return state
+
+    def _ev_status(self):
+        """Announced EV as EVStatus(lane, seconds until arrival, group), or None"""
+        self._load_evp_state()
+        lane = self._ev_lane
+        if not lane:
+            return None  # the usual case: no EV, nothing else to compute
+        return EVStatus(lane, self._ev_remaining(), self._lane_to_group.get(lane))
+
+    def _classify_ev(self, group):
+        """What the announced EV means for a green of `group`, as (decision, EVStatus or None).
+
+        decision is "keep" (critical EV for this group), "preempt" (critical
+        EV for another group) or None (no EV, or not critical yet).
+        """
+        ev = self._ev_status()
+        if ev is None or ev.group is None or ev.remaining > self.EV_CRITICAL_SECONDS:
+            return None, ev
+        return ("keep" if ev.group == group else "preempt"), ev
+
+    def _ev_remaining(self):
+        """Seconds until the announced EV arrives (0 once it is due)"""
+        return max(0, self._ev_arrival_deadline - time.monotonic())
 
     def handle_emergency_vehicle(self, emergency_lane):
         """Handle emergency vehicle"""
         self.emergency_detected = True
         self.emergency_lane = emergency_lane
-        print(f"\n🚨 EMERGENCY VEHICLE DETECTED IN {emergency_lane}")
+        self.log.info("\n🚨 EMERGENCY VEHICLE DETECTED IN %s", emergency_lane)
         # Emergency: give 30s green to emergency lane, 5s to other
         if emergency_lane in ("North", "South"):
             return {"NorthSouth": 30, "EastWest": 5}
@@ -662,12 +1325,12 @@ class TrafficSignalController:
         """Log data + notify dashboard"""
         avg_wait_traditional = 90
         avg_wait_intelliflow = (signal_timings["NorthSouth"] + signal_timings["EastWest"]) / 2
+        time_saved = avg_wait_traditional - avg_wait_intelliflow
+        # Guarded so a zero baseline can never abort the cycle's log entry
+        efficiency = round(100.0 * time_saved / avg_wait_traditional, 2) if avg_wait_traditional else 0.0
 
         lane_counts = {lane: vehicle_counts.get(lane, 0) for lane in self.lane_order}
-        group_counts = {
-            group: sum(lane_counts.get(lane, 0) for lane in lanes)
-            for group, lanes in self.lane_groups.items()
-        }
+        group_counts = dict(self._group_totals(vehicle_counts))
         total_vehicles = sum(lane_counts.values())
 
         log_entry = {
@@ -680,38 +1343,62 @@ class TrafficSignalController:
             "emergency": self.emergency_detected,
             "avg_wait_time_traditional": avg_wait_traditional,
             "avg_wait_time_intelliflow": avg_wait_intelliflow,
-            "time_saved": avg_wait_traditional - avg_wait_intelliflow,
-            "efficiency_improvement": round(((avg_wait_traditional - avg_wait_intelliflow)
-                                             / avg_wait_traditional) * 100, 2)
+            "time_saved": time_saved,
+            "efficiency_improvement": efficiency,
         }
 
         self.log_data.append(log_entry)
         self.total_vehicles_detected = total_vehicles
 
-        with open('traffic_log.json', 'w') as f:
-            json.dump(self.log_data, f, indent=2)
+        # File I/O and the dashboard notify happen off the control thread
+        self._log_pool.submit(self._write_log_entry, log_entry)
 
+        self.log.info("\n📈 Statistics Updated:\n   Time Saved: %.1fs per cycle\n   Efficiency: %s%% better",
+                      time_saved, efficiency)
+
+    def _write_log_entry(self, log_entry):
+        """Append one entry as a JSON line, then tell the dashboard it's there"""
+        if orjson:
+            line = orjson.dumps(log_entry, option=orjson.OPT_APPEND_NEWLINE)
+        else:
+            line = (json.dumps(log_entry) + "\n").encode()
         try:
-            import requests
-            requests.get("http://127.0.0.1:5000/notify_update", timeout=1)
-            print("🌐 Dashboard notified for live update.")
-        except Exception as e:
-            print(f"⚠️ Dashboard update failed: {e}")
+            self._log_fh.write(line)
+            self._log_fh.flush()
+        except (OSError, ValueError) as e:
+            self.log.warning("⚠️ Failed to write traffic log: %s", e)
+            return
+        if self._dashboard_in_process:
+            # Just wakes the dashboard's notifier thread, no HTTP round trip
+            self._push()
+            return
+        # Fire and forget: a busy dashboard must not stall the log writer
+        try:
+            self._notify_pool.submit(self._notify_dashboard)
+        except RuntimeError:
+            pass  # shutting down
 
-        print(f"\n📈 Statistics Updated:")
-        print(f"   Time Saved: {log_entry['time_saved']:.1f}s per cycle")
-        print(f"   Efficiency: {log_entry['efficiency_improvement']}% better")
+    def _notify_dashboard(self):
+        """Ask the dashboard server to push the new log data to its clients"""
+        try:
+            if self._notify_session is None:
+                self._notify_session = requests.Session()
+            self._notify_session.get("http://127.0.0.1:5000/notify_update", timeout=1)
+            self.log.info("🌐 Dashboard notified for live update.")
+        except Exception as e:
+            self.log.warning("⚠️ Dashboard update failed: %s", e)
 
     def draw_info_panel(self, frame, lane_name, vehicle_count, phase_info=""):
         """Draw info panel on frame"""
         h, w = frame.shape[:2]
-        overlay = frame.copy()
-        cv2.rectangle(overlay, (10, h - 150), (400, h - 10), (0, 0, 0), -1)
-        frame = cv2.addWeighted(overlay, 0.7, frame, 0.3, 0)
+        # 70% black panel: darken just the panel region in place rather than
+        # blending a full-frame copy
+        panel = frame[max(0, h - 150):h - 9, 10:401]
+        cv2.convertScaleAbs(panel, dst=panel, alpha=0.3)
         y_offset = h - 130
         
-        cv2.putText(frame, f"{lane_name} LANE", (20, y_offset),
-                    cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
+        self._blit_overlay(frame, f"{lane_name} LANE", (20, y_offset),
+                           0.7, (0, 255, 255), 2)
         y_offset += 30
         
         cv2.putText(frame, f"Vehicles: {vehicle_count}", (20, y_offset),
@@ -725,12 +1412,39 @@ class TrafficSignalController:
         cv2.putText(frame, f"Total: {self.total_vehicles_detected}",
                     (20, h - 30), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 2)
         
-        if self.emergency_detected:
-            cv2.rectangle(frame, (w - 200, 10), (w - 10, 60), (0, 0, 255), -1)
-            cv2.putText(frame, "EMERGENCY", (w - 190, 40),
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+        if self.emergency_detected and w >= 200:
+            badge = self._panel_cache.get("EMERGENCY")
+            if badge is None:
+                badge = np.empty((51, 191, 3), np.uint8)
+                badge[:] = (0, 0, 255)
+                cv2.putText(badge, "EMERGENCY", (10, 30),
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.8, (255, 255, 255), 2)
+                self._panel_cache["EMERGENCY"] = badge
+            frame[10:61, w - 200:w - 9] = badge
         return frame
 
+    def _blit_overlay(self, frame, text, org, scale, color, thickness):
+        """Stamp cached pre-rendered text onto frame, falling back to putText"""
+        key = (text, scale, color, thickness)
+        cached = self._panel_cache.get(key)
+        if cached is None:
+            (tw, th), baseline = cv2.getTextSize(text, cv2.FONT_HERSHEY_SIMPLEX,
+                                                 scale, thickness)
+            pad = thickness + 1
+            glyphs = np.zeros((th + baseline + 2 * pad, tw + 2 * pad, 3), np.uint8)
+            cv2.putText(glyphs, text, (pad, th + pad), cv2.FONT_HERSHEY_SIMPLEX,
+                        scale, color, thickness)
+            cached = (glyphs, glyphs.any(axis=2, keepdims=True), th + pad, pad)
+            self._panel_cache[key] = cached
+        glyphs, mask, rise, pad = cached
+        x, y = org[0] - pad, org[1] - rise
+        region = frame[max(0, y):y + glyphs.shape[0], max(0, x):x + glyphs.shape[1]]
+        if region.shape != glyphs.shape:
+            # Clipped by a small frame; draw it the slow way
+            cv2.putText(frame, text, org, cv2.FONT_HERSHEY_SIMPLEX, scale, color, thickness)
+            return
+        np.copyto(region, glyphs, where=mask)
+
     # =============================================================
     # Main Loop
     # =============================================================
@@ -738,83 +1452,84 @@ class TrafficSignalController:
         """Process configured video feeds - detect vehicles and stream to web"""
         self.running = True
         frame_count = 0
+
+        self._capture_threads = []
+        for lane in self.active_lanes:
+            if lane in self.captures:
+                thread = threading.Thread(target=self._capture_loop, args=(lane,), daemon=True)
+                thread.start()
+                self._capture_threads.append(thread)
+            thread = threading.Thread(target=self._encode_loop, args=(lane,), daemon=True)
+            thread.start()
+            self._capture_threads.append(thread)
         
+        self._has_display = self._probe_display()
+        if not self._has_display:
+            print("ℹ️ No display available, local preview window disabled")
+
         while self.running:
-            lane_frames = {}
             latest_counts = {}
 
-            for lane in self.active_lanes:
-                cap = self.captures.get(lane)
-                if not cap:
-                    continue
-
-                ret, frame = cap.read()
-                if not ret:
-                    lane_source = self.lane_sources[lane]
-                    if lane_source.get("is_video_file"):
-                        if not self.video_finished_flags.get(lane, False):
-                            print(f"🔄 {lane} video ended, restarting...")
-                            self.video_finished_flags[lane] = True
-                        cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
-                        ret, frame = cap.read()
-                        if ret:
-                            self.video_finished_flags[lane] = False
-
-                if not ret:
-                    continue
-
-                boxes = self.detect_vehicles(frame)
-                latest_counts[lane] = self.count_vehicles_in_frame(boxes, frame, lane)
-                lane_frames[lane] = frame
+            # Take whatever new frames the capture threads have published
+            self._frame_ready.wait(0.1)
+            self._frame_ready.clear()
+            lane_frames = {}
+            for lane, frames in self._frame_queues.items():
+                try:
+                    lane_frames[lane] = frames.get_nowait()
+                except queue.Empty:
+                    pass
 
             if not lane_frames:
-                time.sleep(0.1)
                 continue
 
-            self.current_counts.update(self.smooth_vehicle_counts(latest_counts))
-            self._update_group_counts()
-            self.total_vehicles_detected = sum(self.group_counts.values())
-            self._update_phase_remaining_times()
-
-            phase_info = f"Phase: {self.current_phase}"
-
-            with self.frame_lock:
-                for lane, frame in lane_frames.items():
-                    label = f"{lane.upper()}"
-                    vehicle_count = self.current_counts.get(lane, 0)
-                    frame = self.draw_info_panel(frame, label, vehicle_count, phase_info)
-                    cv2.putText(frame, f"{lane} Lane - Vehicles: {vehicle_count}", (10, 30),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.8, (0, 255, 255), 2)
-
-                    self.frames[lane] = frame.copy()
-                    success, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 85])
-                    if success:
-                        encoded = buffer.tobytes()
-                        self.encoded_frames[lane] = encoded
-
-                        if lane == "North":
-                            self.north_frame = frame.copy()
-                            self.north_frame_encoded = encoded
-                        elif lane == "South":
-                            self.south_frame = frame.copy()
-                            self.south_frame_encoded = encoded
-                        elif lane == "East":
-                            self.east_frame = frame.copy()
-                            self.east_frame_encoded = encoded
-                        elif lane == "West":
-                            self.west_frame = frame.copy()
-                            self.west_frame_encoded = encoded
-
-            # Display frames locally (optional - can be disabled for headless server)
-            try:
-                display_frames = [self.frames[lane] for lane in self.lane_order if lane in self.frames]
-                combined_frame = self._combine_frames_for_display(display_frames)
+            # Traffic doesn't change between consecutive frames; each lane is
+            # detected every Nth frame (batched with any other lane that is
+            # due) and its previous boxes are redrawn in between
+            detect_frames = {}
+            for lane, frame in lane_frames.items():
+                self._detect_countdown[lane] -= 1
+                if self._detect_countdown[lane] <= 0:
+                    detect_frames[lane] = frame
+            if detect_frames:
+                self._last_boxes.update(self.detect_vehicles(detect_frames))
+
+            # Counting alone is just len(boxes); drawing happens per lane on
+            # the output threads
+            for lane in detect_frames:
+                count = self.count_vehicles_in_frame(self._last_boxes.get(lane), None, lane, draw=False)
+                latest_counts[lane] = count
+                self._adapt_detect_stride(lane, count)
+
+            # Counts only move when a detection ran
+            if latest_counts:
+                # Also updates current_counts and group_counts incrementally
+                self.smooth_vehicle_counts(latest_counts)
+                self.total_vehicles_detected = sum(self.group_counts.values())
+            phase_info = self._phase_info
+
+            # Annotation and JPEG encoding run on each lane's output thread, in
+            # parallel across lanes; the frame isn't touched again here so it
+            # can be handed over as is (a dropped one goes back to its pool)
+            for lane, frame in lane_frames.items():
+                _put_latest(self._encode_queues[lane],
+                            (frame, self._last_boxes.get(lane), self.current_counts.get(lane, 0), phase_info),
+                            lambda item, lane=lane: self._release_frame(lane, item[0]))
+
+            # Display frames locally (skipped entirely on headless servers)
+            if self._has_display:
+                # Published frames go back to the pool once replaced, so they
+                # are only read under the lock
+                with self.frame_lock:
+                    display_frames = [self.frames[lane] for lane in self.lane_order if lane in self.frames]
+                    combined_frame = self._combine_frames_for_display(display_frames)
+                    if combined_frame is not None:
+                        cv2.imshow('IntelliFlow - Traffic Video System', combined_frame)
                 if combined_frame is not None:
-                    cv2.imshow('IntelliFlow - Traffic Video System', combined_frame)
 
                     key = cv2.waitKey(1) & 0xFF
                     if key == ord('q'):
-                        self.running = False
+                        self.stop()
                         break
                     elif key == ord('e'):
                         self.emergency_detected = True
@@ -823,15 +1538,164 @@ class TrafficSignalController:
                     elif key == ord('r'):
                         self.total_vehicles_detected = 0
                         self.cycles_completed = 0
-                        self.log_data = []
+                        self.log_data.clear()
                         print("\n🔄 Statistics reset!")
-            except cv2.error:
-                # No display available (headless server) - continue without showing
-                pass
-
+                    elif cv2.getWindowProperty('IntelliFlow - Traffic Video System',
+                                               cv2.WND_PROP_VISIBLE) < 1:
+                        # Window closed by the user: stop tiling and drawing
+                        # for it, processing and streaming carry on headless
+                        self._has_display = False
+                        print("ℹ️ Local preview window closed")
+
+            # No fixed sleep: the loop is paced by the capture threads (camera
+            # rate, or native FPS for video files) via _frame_ready
             frame_count += 1
-            time.sleep(0.033)  # ~30 FPS
     
+    def _hold_phase(self, duration, ev_check=None):
+        """Hold the current phase until its deadline.
+
+        The phase end and the 0.5s dashboard pushes are enqueued on a single
+        sched.scheduler against absolute monotonic times, so the thread sleeps
+        straight to the next event instead of polling every 100ms.
+
+        ev_check(holding) is polled during green phases (every 0.1s while an
+        EV is announced, every 0.5s otherwise) and immediately whenever
+        notify_ev_update() is called. With the dashboard in-process EV changes
+        arrive that way, so a green only re-reads the file every
+        EV_FALLBACK_POLL seconds (for writers that don't notify) plus one
+        timer when an announced EV's ETA turns critical. It returns True to
+        keep the phase green past its deadline, False to end the phase
+        immediately, or None to let the normal countdown continue.
+
+        stop() ends any phase at once.
+        """
+        t0 = time.monotonic()
+        state = {"expired": False, "holding": False, "ev_next": None}
+
+        def wake_wait(delay):
+            # Sleep until the next scheduled event, unless woken early
+            if self._phase_wake.wait(delay):
+                self._phase_wake.clear()
+                if scheduler.empty():
+                    return  # phase already finished
+                if not self.running:
+                    finish()
+                    return
+                if ev_check is None:
+                    return  # EV change outside a green: the next green's first tick reads it
+                try:
+                    scheduler.cancel(state["ev_next"])
+                except ValueError:
+                    pass  # no poll pending
+                now = time.monotonic()
+                state["ev_next"] = scheduler.enterabs(now, 2, ev_tick, (now,))
+
+        scheduler = sched.scheduler(time.monotonic, wake_wait)
+
+        def finish():
+            for event in scheduler.queue:
+                scheduler.cancel(event)
+
+        def expire():
+            state["expired"] = True
+            if not state["holding"]:
+                finish()
+
+        def ev_tick(due):
+            decision = ev_check(state["holding"])
+            if decision is False:
+                finish()
+                return
+            state["holding"] = bool(decision)
+            if state["expired"] and not state["holding"]:
+                finish()
+                return
+            if self._dashboard_in_process:
+                # notify_ev_update() covers changes made through our dashboard;
+                # a slow poll still catches a file written without a notify,
+                # and one timer catches the ETA going critical
+                interval = self.EV_FALLBACK_POLL
+                ev = self._ev_status()
+                if ev and ev.remaining > self.EV_CRITICAL_SECONDS:
+                    interval = min(interval, ev.remaining - self.EV_CRITICAL_SECONDS + 0.01)
+            # Poll at 10Hz only while an EV is announced; otherwise 2Hz is plenty
+            elif state["holding"] or self._ev_announced:
+                interval = 0.1
+            else:
+                interval = 0.5
+            state["ev_next"] = scheduler.enterabs(due + interval, 2, ev_tick, (due + interval,))
+
+        def push_tick(due):
+            # The countdown is only read for dashboard payloads, so it is
+            # refreshed right before each push rather than every frame
+            self._update_phase_remaining_times()
+            try:
+                self._push()
+            except Exception:
+                pass
+            scheduler.enterabs(due + 0.5, 3, push_tick, (due + 0.5,))
+
+        scheduler.enterabs(t0 + duration, 1, expire)
+        if ev_check is not None:
+            state["ev_next"] = scheduler.enterabs(t0, 2, ev_tick, (t0,))
+        # Without a dashboard there is nobody to push to, so the phase sleeps
+        # straight to its deadline (or the next EV poll)
+        if self._push_enabled:
+            scheduler.enterabs(t0 + 0.5, 3, push_tick, (t0 + 0.5,))
+        scheduler.run()
+
+    def notify_ev_update(self):
+        """Wake a holding green phase to re-read the emergency state now"""
+        self._evp_fresh_until = 0.0
+        self._phase_wake.set()
+
+    def stop(self):
+        """Stop the controller loops; a holding phase ends immediately"""
+        self.running = False
+        self._phase_wake.set()
+
+    def _run_phase(self, spec, duration, ev_check=None):
+        """Switch both signal heads to `spec` and hold it for `duration` seconds"""
+        if not self.running:
+            return  # shutting down: the shutdown path sets all-red itself
+        self.log.info("%s (%ss)", spec.banner, duration)
+        self.current_phase = spec.name
+        self._phase_info = f"Phase: {spec.name}"
+        self.phase_start_time = time.monotonic()
+        self.phase_duration = duration
+        self._phase_deadline = self.phase_start_time + duration
+        # During a green the other group shows its upcoming green time; during
+        # yellow it shows 0; all-red counts down both
+        green = spec.name.endswith("_Green")
+        self._countdown_groups = spec.countdown_groups
+        self.phase_remaining_time = duration
+        self.phase_remaining_times = {
+            group: (duration if group in spec.countdown_groups
+                    else self._current_signal_timings.get(group, self.MIN_GREEN) if green
+                    else 0)
+            for group in ("NorthSouth", "EastWest")
+        }
+        self._publish_state_snapshot()
+        # The Arduino writer spaces the pair, or sends it in one write
+        self.send_signals_to_arduino(spec.l1, spec.l2)
+        self._hold_phase(duration, ev_check)
+
+    def _publish_state_snapshot(self):
+        """Replace the phase snapshot in one assignment so readers never see a torn update"""
+        self._state_snapshot = {
+            "phase": self.current_phase,
+            "phase_start_time": self.phase_start_time,
+            "phase_duration": self.phase_duration,
+            # Each cycle gets a fresh timings dict that is never mutated, so
+            # the snapshot can share it instead of copying it every phase
+            "signal_timings": self._current_signal_timings,
+            "cycle": self.cycles_completed,
+        }
+
+    def get_state_snapshot(self):
+        """Phase, timing and cycle state as of the last phase change"""
+        return self._state_snapshot
+
     def run_traffic_control(self):
         """Main traffic light control loop with proper cycling"""
         print("\n" + "=" * 60)
@@ -843,30 +1707,80 @@ class TrafficSignalController:
         print("   Press 'r' to reset statistics")
         print("\n⏳ Traffic lights will cycle based on vehicle counts...")
         print("=" * 60 + "\n")
-        
+
+        def make_ev_green_check(group, yield_to_other):
+            """Build the per-tick EV check for a green phase of `group`."""
+            group_label = GROUP_LABELS[group]
+            other_label = GROUP_LABELS[OTHER_GROUP[group]]
+
+            def check(holding):
+                decision, ev = self._classify_ev(group)
+                if decision == "keep":
+                    # EV <10s away from this group: keep it green until the EV clears
+                    if not holding:
+                        if yield_to_other:
+                            self.log.info("🚑 EV CRITICAL: %s lane, %ds - Keeping %s green until EV clears",
+                                          ev.lane, ev.remaining, group_label)
+                        else:
+                            self.log.info("🚑 EV CRITICAL: Keeping %s green until EV clears", group_label)
+                    # Set special value for "--" display
+                    self.phase_remaining_time = -1
+                    self.phase_remaining_times[group] = -1
+                    return True
+                if decision == "preempt" and yield_to_other:
+                    self.log.info("🚑 EV CRITICAL DURING PHASE: %s lane, %ds - Transitioning to %s NOW",
+                                  ev.lane, ev.remaining, other_label)
+                    return False
+                if not holding:
+                    return None
+                # Was holding: the EV has cleared, passed or moved on
+                if ev is None:
+                    self.log.info("✅ EV cleared - resuming normal cycle")
+                elif yield_to_other:
+                    self.log.info("✅ EV cleared or passed - resuming normal cycle")
+                return False
+            return check
+
+        # Normal green phases also hand over to the other group for a critical EV;
+        # EV priority greens only hold for their own group.
+        check_ev_during_green = {group: make_ev_green_check(group, True) for group in GROUP_LABELS}
+        keep_green = {group: make_ev_green_check(group, False) for group in GROUP_LABELS}
+
+        def critical_ev():
+            """EVStatus for an EV due within 10s, else None"""
+            ev = self._ev_status()
+            return ev if ev and ev.remaining <= self.EV_CRITICAL_SECONDS else None
+
+        def ev_green_time(green_time, ev):
+            """Stretch a green so it stays on until the EV has passed"""
+            return max(green_time, int(ev.remaining + self.EV_CLEAR_MARGIN))
+
+        def run_ev_priority_green(group, ev):
+            """Give `group` green until the EV has passed"""
+            green_time = signal_timings[group]
+            if ev.remaining > 0:
+                green_time = ev_green_time(green_time, ev)
+            self._run_phase(EV_PRIORITY_GREEN[group], green_time, keep_green[group])
+
+        def preempt(ev, group, action):
+            """Run `group`'s EV priority green if `ev` is critical for it; True if it did"""
+            if not (ev and ev.group == group):
+                return False
+            self.log.info("🚑 EV CRITICAL: %s lane, %ds - %s", ev.lane, ev.remaining, action)
+            run_ev_priority_green(group, ev)
+            return True
+
         try:
             while self.running:
                 # Check EV state at the start of each cycle
-                evp_state = self._load_evp_state()
-                ev_active = evp_state.get("active", False)
-                ev_lane = evp_state.get("lane")
-                ev_remaining = 0
-                ev_group = None
-                
-                if ev_active and ev_lane:
-                    expected_arrival = evp_state.get("expected_arrival_ts", 0)
-                    ev_remaining = max(0, expected_arrival - time.time())
-                    if ev_lane in self.lane_groups.get("NorthSouth", []):
-                        ev_group = "NorthSouth"
-                    elif ev_lane in self.lane_groups.get("EastWest", []):
-                        ev_group = "EastWest"
-                
+                ev = self._ev_status()
+
                 # Calculate green times based on current vehicle counts
                 # Pass current phase info so calculate_green_time can plan ahead
                 current_phase_for_calc = getattr(self, 'current_phase', 'All_Red')
                 phase_elapsed = 0
                 if hasattr(self, 'phase_start_time'):
-                    phase_elapsed = time.time() - self.phase_start_time
+                    phase_elapsed = time.monotonic() - self.phase_start_time
                 
                 if self.emergency_detected:
                     signal_timings = self.handle_emergency_vehicle(self.emergency_lane)
@@ -877,619 +1791,83 @@ class TrafficSignalController:
                         current_phase=current_phase_for_calc,
                         phase_elapsed=phase_elapsed
                     )
-                self._update_group_counts()
+                self._current_signal_timings = signal_timings
                 
-                print(f"\n{'=' * 60}")
-                print(f"⏱️  Cycle #{self.cycles_completed + 1}")
-                if ev_active:
-                    print(f"🚑 EMERGENCY VEHICLE ACTIVE: {ev_lane} lane, {int(ev_remaining)}s remaining")
-                print(f"{'=' * 60}")
-                print(f"\n📊 Vehicle Counts:")
-                for lane in self.active_lanes:
-                    print(f"   {lane} Lane: {self.current_counts.get(lane, 0)} vehicles")
-                print(f"\n📊 Group Totals:")
-                print(f"   North/South Total: {self.group_counts.get('NorthSouth', 0)} vehicles")
-                print(f"   East/West Total: {self.group_counts.get('EastWest', 0)} vehicles")
-                print(f"\n⏱️  Calculated Signal Timings:")
-                print(f"   North/South: {signal_timings['NorthSouth']}s GREEN")
-                print(f"   East/West: {signal_timings['EastWest']}s GREEN")
+                # One log record per cycle summary instead of a write per line
+                summary = ["", "=" * 60, f"⏱️  Cycle #{self.cycles_completed + 1}"]
+                if ev:
+                    summary.append(f"🚑 EMERGENCY VEHICLE ACTIVE: {ev.lane} lane, {int(ev.remaining)}s remaining")
+                summary += ["=" * 60, "", "📊 Vehicle Counts:"]
+                summary += [f"   {lane} Lane: {self.current_counts.get(lane, 0)} vehicles"
+                            for lane in self.active_lanes]
+                summary += [
+                    "", "📊 Group Totals:",
+                    f"   North/South Total: {self.group_counts.get('NorthSouth', 0)} vehicles",
+                    f"   East/West Total: {self.group_counts.get('EastWest', 0)} vehicles",
+                    "", "⏱️  Calculated Signal Timings:",
+                    f"   North/South: {signal_timings['NorthSouth']}s GREEN",
+                    f"   East/West: {signal_timings['EastWest']}s GREEN",
+                ]
+                self.log.info("\n".join(summary))
                 
                 # =====================================
                 # 🔴🟡🟢 Traffic Light Cycle
                 # =====================================
-                # Phase 1: North/South GREEN, East/West RED
-                # Check EV state RIGHT BEFORE starting phase
-                evp_state_check = self._load_evp_state()
-                ev_check_active = evp_state_check.get("active", False)
-                ev_check_lane = evp_state_check.get("lane")
-                ev_check_remaining = 0
-                ev_check_group = None
-                
-                if ev_check_active and ev_check_lane:
-                    ev_check_arrival = evp_state_check.get("expected_arrival_ts", 0)
-                    ev_check_remaining = max(0, ev_check_arrival - time.time())
-                    if ev_check_lane in self.lane_groups.get("NorthSouth", []):
-                        ev_check_group = "NorthSouth"
-                    elif ev_check_lane in self.lane_groups.get("EastWest", []):
-                        ev_check_group = "EastWest"
-                
-                # CRITICAL: If EV is <10s away, EV lane MUST be green
-                if ev_check_active and ev_check_remaining <= 10 and ev_check_group == "EastWest":
-                    # EV is coming from East/West - skip North/South, go directly to East/West
-                    print(f"🚑 EV CRITICAL: {ev_check_lane} lane, {int(ev_check_remaining)}s - Skipping North/South, going to East/West")
-                    # Skip to Phase 4 (East/West Green)
-                    green_time_ew = signal_timings['EastWest']
-                    # Ensure EV lane gets enough time
-                    if ev_check_remaining > 0:
-                        green_time_ew = max(green_time_ew, int(ev_check_remaining + 15))  # Stay green until EV passes
-                    print(f"\n🟢 Phase 4 (EV PRIORITY): East/West GREEN ({green_time_ew}s)")
-                    self.current_phase = "EastWest_Green"
-                    self.phase_start_time = time.time()
-                    self.phase_remaining_time = green_time_ew
-                    self.phase_remaining_times = {"NorthSouth": 0, "EastWest": green_time_ew}
-                    self.send_signal_to_arduino("L1", "R")  # North/South red
-                    time.sleep(0.1)
-                    self.send_signal_to_arduino("L2", "G")  # East/West green
-                    start_time = time.time()
-                    last_push_time = time.time()
-                    ev_keep_green_priority_ew = False
-                    while time.time() - start_time < green_time_ew or ev_keep_green_priority_ew:
-                        # Check EV state - keep green if <10s
-                        evp_state_priority = self._load_evp_state()
-                        if evp_state_priority.get("active") and evp_state_priority.get("lane"):
-                            ev_priority_lane = evp_state_priority["lane"]
-                            ev_priority_arrival = evp_state_priority.get("expected_arrival_ts", 0)
-                            ev_priority_remaining = max(0, ev_priority_arrival - time.time())
-                            if ev_priority_lane in self.lane_groups.get("EastWest", []):
-                                if ev_priority_remaining <= 10:
-                                    if not ev_keep_green_priority_ew:
-                                        print(f"🚑 EV CRITICAL: Keeping East/West green until EV clears")
-                                    ev_keep_green_priority_ew = True
-                                    self.phase_remaining_time = -1
-                                    self.phase_remaining_times["EastWest"] = -1
-                                else:
-                                    if ev_keep_green_priority_ew:
-                                        ev_keep_green_priority_ew = False
-                                        break
-                            else:
-                                if ev_keep_green_priority_ew:
-                                    ev_keep_green_priority_ew = False
-                                    break
-                        else:
-                            if ev_keep_green_priority_ew:
-                                print(f"✅ EV cleared - resuming normal cycle")
-                                ev_keep_green_priority_ew = False
-                                break
-                        
-                        if not ev_keep_green_priority_ew:
-                            elapsed = time.time() - self.phase_start_time
-                            remaining = max(0, green_time_ew - elapsed)
-                            self.phase_remaining_time = remaining
-                            self.phase_remaining_times["EastWest"] = remaining
-                        if time.time() - last_push_time >= 0.5:
-                            try:
-                                from dashboard import push_live_update
-                                push_live_update()
-                                last_push_time = time.time()
-                            except:
-                                pass
-                        time.sleep(0.1)
-                    # Skip to end of cycle after EV lane green
-                    self.log_statistics(self.current_counts, signal_timings, self.current_phase)
-                    self.cycles_completed += 1
-                    continue
-                
-                # Normal North/South phase
-                green_time_ns = signal_timings['NorthSouth']
-                # If EV is coming from North/South and <10s, extend green time
-                if ev_check_active and ev_check_remaining <= 10 and ev_check_group == "NorthSouth":
-                    green_time_ns = max(green_time_ns, int(ev_check_remaining + 15))  # Stay green until EV passes
-                    print(f"🚑 EV CRITICAL: {ev_check_lane} lane, {int(ev_check_remaining)}s - Extending North/South green to {green_time_ns}s")
-                
-                print(f"\n🟢 Phase 1: North/South GREEN ({green_time_ns}s)")
-                self.current_phase = "NorthSouth_Green"
-                self.phase_start_time = time.time()  # Reset phase start time
-                self.phase_remaining_time = green_time_ns  # Set initial remaining time
-                self.phase_remaining_times = {"NorthSouth": green_time_ns, "EastWest": 0}
-                self.send_signal_to_arduino("L1", "G")  # North/South green
-                time.sleep(0.1)  # Delay between commands
-                self.send_signal_to_arduino("L2", "R")  # East/West red
-                start_time = time.time()
-                last_push_time = time.time()
-                ev_keep_green_ns = False
-                while time.time() - start_time < green_time_ns or ev_keep_green_ns:
-                    # Check EV state DURING phase
-                    evp_state_during = self._load_evp_state()
-                    if evp_state_during.get("active") and evp_state_during.get("lane"):
-                        ev_during_lane = evp_state_during["lane"]
-                        ev_during_arrival = evp_state_during.get("expected_arrival_ts", 0)
-                        ev_during_remaining = max(0, ev_during_arrival - time.time())
-                        ev_during_group = None
-                        if ev_during_lane in self.lane_groups.get("NorthSouth", []):
-                            ev_during_group = "NorthSouth"
-                        elif ev_during_lane in self.lane_groups.get("EastWest", []):
-                            ev_during_group = "EastWest"
-                        
-                        # CRITICAL: If EV is <10s and we're in EV lane, keep it green indefinitely
-                        if ev_during_remaining <= 10 and ev_during_group == "NorthSouth":
-                            # EV from North/South and we're in North/South - keep green!
-                            if not ev_keep_green_ns:
-                                print(f"🚑 EV CRITICAL: {ev_during_lane} lane, {int(ev_during_remaining)}s - Keeping North/South green until EV clears")
-                            ev_keep_green_ns = True
-                            # Set special value for "--" display
-                            self.phase_remaining_time = -1
-                            self.phase_remaining_times["NorthSouth"] = -1
-                        # CRITICAL: If EV is <10s and we're in wrong phase, transition NOW
-                        elif ev_during_remaining <= 10 and ev_during_group == "EastWest":
-                            # EV from East/West but we're in North/South - transition immediately
-                            print(f"🚑 EV CRITICAL DURING PHASE: {ev_during_lane} lane, {int(ev_during_remaining)}s - Transitioning to East/West NOW")
-                            ev_keep_green_ns = False
-                            break  # Exit current phase loop
-                        else:
-                            # EV not critical or cleared
-                            if ev_keep_green_ns:
-                                print(f"✅ EV cleared or passed - resuming normal cycle")
-                                ev_keep_green_ns = False
-                                break
-                    else:
-                        # EV cleared
-                        if ev_keep_green_ns:
-                            print(f"✅ EV cleared - resuming normal cycle")
-                            ev_keep_green_ns = False
-                            break
-                    
-                    # Update remaining time continuously (only if not in EV keep-green mode)
-                    if not ev_keep_green_ns:
-                        elapsed = time.time() - self.phase_start_time
-                        remaining = max(0, green_time_ns - elapsed)
-                        self.phase_remaining_time = remaining
-                        self.phase_remaining_times["NorthSouth"] = remaining
-                    # Push updates to web dashboard every 0.5 seconds
-                    if time.time() - last_push_time >= 0.5:
-                        try:
-                            from dashboard import push_live_update
-                            push_live_update()
-                            last_push_time = time.time()
-                        except:
-                            pass
-                    time.sleep(0.1)  # Update more frequently
-                
-                # After North/South green, check if we need to skip to EV lane
-                evp_state_after = self._load_evp_state()
-                if evp_state_after.get("active") and evp_state_after.get("lane"):
-                    ev_after_lane = evp_state_after["lane"]
-                    ev_after_arrival = evp_state_after.get("expected_arrival_ts", 0)
-                    ev_after_remaining = max(0, ev_after_arrival - time.time())
-                    ev_after_group = None
-                    if ev_after_lane in self.lane_groups.get("NorthSouth", []):
-                        ev_after_group = "NorthSouth"
-                    elif ev_after_lane in self.lane_groups.get("EastWest", []):
-                        ev_after_group = "EastWest"
-                    
-                    if ev_after_remaining <= 10 and ev_after_group == "EastWest":
-                        # Skip yellow and all-red, go directly to East/West green
-                        print(f"🚑 EV CRITICAL: Skipping yellow/all-red, going to East/West green")
-                        green_time_ew_emergency = signal_timings['EastWest']
-                        if ev_after_remaining > 0:
-                            green_time_ew_emergency = max(green_time_ew_emergency, int(ev_after_remaining + 15))
-                        print(f"\n🟢 Phase 4 (EV PRIORITY): East/West GREEN ({green_time_ew_emergency}s)")
-                        self.current_phase = "EastWest_Green"
-                        self.phase_start_time = time.time()
-                        self.phase_remaining_time = green_time_ew_emergency
-                        self.phase_remaining_times = {"NorthSouth": 0, "EastWest": green_time_ew_emergency}
-                        self.send_signal_to_arduino("L1", "R")
-                        time.sleep(0.1)
-                        self.send_signal_to_arduino("L2", "G")
-                        start_time = time.time()
-                        last_push_time = time.time()
-                        ev_keep_green_emergency_ew = False
-                        while time.time() - start_time < green_time_ew_emergency or ev_keep_green_emergency_ew:
-                            # Check EV state - keep green if <10s
-                            evp_state_emergency = self._load_evp_state()
-                            if evp_state_emergency.get("active") and evp_state_emergency.get("lane"):
-                                ev_emergency_lane = evp_state_emergency["lane"]
-                                ev_emergency_arrival = evp_state_emergency.get("expected_arrival_ts", 0)
-                                ev_emergency_remaining = max(0, ev_emergency_arrival - time.time())
-                                if ev_emergency_lane in self.lane_groups.get("EastWest", []):
-                                    if ev_emergency_remaining <= 10:
-                                        if not ev_keep_green_emergency_ew:
-                                            print(f"🚑 EV CRITICAL: Keeping East/West green until EV clears")
-                                        ev_keep_green_emergency_ew = True
-                                        self.phase_remaining_time = -1
-                                        self.phase_remaining_times["EastWest"] = -1
-                                    else:
-                                        if ev_keep_green_emergency_ew:
-                                            ev_keep_green_emergency_ew = False
-                                            break
-                                else:
-                                    if ev_keep_green_emergency_ew:
-                                        ev_keep_green_emergency_ew = False
-                                        break
-                            else:
-                                if ev_keep_green_emergency_ew:
-                                    print(f"✅ EV cleared - resuming normal cycle")
-                                    ev_keep_green_emergency_ew = False
-                                    break
-                            
-                            if not ev_keep_green_emergency_ew:
-                                elapsed = time.time() - self.phase_start_time
-                                remaining = max(0, green_time_ew_emergency - elapsed)
-                                self.phase_remaining_time = remaining
-                                self.phase_remaining_times["EastWest"] = remaining
-                            if time.time() - last_push_time >= 0.5:
-                                try:
-                                    from dashboard import push_live_update
-                                    push_live_update()
-                                    last_push_time = time.time()
-                                except:
-                                    pass
-                            time.sleep(0.1)
-                        self.log_statistics(self.current_counts, signal_timings, self.current_phase)
-                        self.cycles_completed += 1
-                        continue
-                
-                # Phase 2: North/South YELLOW, East/West RED
-                # GOLDEN RULE: Always complete the full countdown
-                print(f"🟡 Phase 2: North/South YELLOW ({self.YELLOW_TIME}s)")
-                self.current_phase = "NorthSouth_Yellow"
-                self.phase_start_time = time.time()  # Reset phase start time
-                self.phase_remaining_time = self.YELLOW_TIME  # Set initial remaining time
-                self.phase_remaining_times = {"NorthSouth": self.YELLOW_TIME, "EastWest": 0}
-                self.send_signal_to_arduino("L1", "Y")
-                time.sleep(0.1)
-                self.send_signal_to_arduino("L2", "R")
-                start_time = time.time()
-                last_push_time = time.time()
-                while time.time() - start_time < self.YELLOW_TIME:
-                    # Update remaining time continuously
-                    elapsed = time.time() - self.phase_start_time
-                    remaining = max(0, self.YELLOW_TIME - elapsed)
-                    self.phase_remaining_time = remaining
-                    self.phase_remaining_times["NorthSouth"] = remaining
-                    self.phase_remaining_times["EastWest"] = 0
-                    # Push updates to web dashboard every 0.5 seconds
-                    if time.time() - last_push_time >= 0.5:
-                        try:
-                            from dashboard import push_live_update
-                            push_live_update()
-                            last_push_time = time.time()
-                        except:
-                            pass
-                    time.sleep(0.1)
-                
-                # Phase 3: ALL RED (safety buffer)
-                # GOLDEN RULE: Always complete the full countdown
-                print(f"🔴 Phase 3: ALL RED ({self.ALL_RED_TIME}s)")
-                self.current_phase = "All_Red"
-                self.phase_start_time = time.time()  # Reset phase start time
-                self.phase_remaining_time = self.ALL_RED_TIME  # Set initial remaining time
-                self.phase_remaining_times = {"NorthSouth": self.ALL_RED_TIME, "EastWest": self.ALL_RED_TIME}
-                self.send_signal_to_arduino("L1", "R")
-                time.sleep(0.1)
-                self.send_signal_to_arduino("L2", "R")
-                start_time = time.time()
-                last_push_time = time.time()
-                while time.time() - start_time < self.ALL_RED_TIME:
-                    # Update remaining time continuously
-                    elapsed = time.time() - self.phase_start_time
-                    remaining = max(0, self.ALL_RED_TIME - elapsed)
-                    self.phase_remaining_time = remaining
-                    self.phase_remaining_times["NorthSouth"] = remaining
-                    self.phase_remaining_times["EastWest"] = remaining
-                    # Push updates to web dashboard every 0.5 seconds
-                    if time.time() - last_push_time >= 0.5:
-                        try:
-                            from dashboard import push_live_update
-                            push_live_update()
-                            last_push_time = time.time()
-                        except:
-                            pass
-                    time.sleep(0.1)
-                
-                # Phase 4: East/West GREEN, North/South RED
-                # Check EV state RIGHT BEFORE starting phase
-                evp_state_check2 = self._load_evp_state()
-                ev_check_active2 = evp_state_check2.get("active", False)
-                ev_check_lane2 = evp_state_check2.get("lane")
-                ev_check_remaining2 = 0
-                ev_check_group2 = None
-                
-                if ev_check_active2 and ev_check_lane2:
-                    ev_check_arrival2 = evp_state_check2.get("expected_arrival_ts", 0)
-                    ev_check_remaining2 = max(0, ev_check_arrival2 - time.time())
-                    if ev_check_lane2 in self.lane_groups.get("NorthSouth", []):
-                        ev_check_group2 = "NorthSouth"
-                    elif ev_check_lane2 in self.lane_groups.get("EastWest", []):
-                        ev_check_group2 = "EastWest"
-                
-                # CRITICAL: If EV is <10s away from North/South, skip East/West
-                if ev_check_active2 and ev_check_remaining2 <= 10 and ev_check_group2 == "NorthSouth":
-                    # EV is coming from North/South - skip East/West, go back to North/South
-                    print(f"🚑 EV CRITICAL: {ev_check_lane2} lane, {int(ev_check_remaining2)}s - Skipping East/West, going to North/South")
-                    green_time_ns_ev = signal_timings['NorthSouth']
-                    # Ensure EV lane gets enough time
-                    if ev_check_remaining2 > 0:
-                        green_time_ns_ev = max(green_time_ns_ev, int(ev_check_remaining2 + 15))  # Stay green until EV passes
-                    print(f"\n🟢 Phase 1 (EV PRIORITY): North/South GREEN ({green_time_ns_ev}s)")
-                    self.current_phase = "NorthSouth_Green"
-                    self.phase_start_time = time.time()
-                    self.phase_remaining_time = green_time_ns_ev
-                    self.phase_remaining_times = {"NorthSouth": green_time_ns_ev, "EastWest": 0}
-                    self.send_signal_to_arduino("L1", "G")  # North/South green
-                    time.sleep(0.1)
-                    self.send_signal_to_arduino("L2", "R")  # East/West red
-                    start_time = time.time()
-                    last_push_time = time.time()
-                    ev_keep_green_priority_ns = False
-                    while time.time() - start_time < green_time_ns_ev or ev_keep_green_priority_ns:
-                        # Check EV state - keep green if <10s
-                        evp_state_priority_ns = self._load_evp_state()
-                        if evp_state_priority_ns.get("active") and evp_state_priority_ns.get("lane"):
-                            ev_priority_lane_ns = evp_state_priority_ns["lane"]
-                            ev_priority_arrival_ns = evp_state_priority_ns.get("expected_arrival_ts", 0)
-                            ev_priority_remaining_ns = max(0, ev_priority_arrival_ns - time.time())
-                            if ev_priority_lane_ns in self.lane_groups.get("NorthSouth", []):
-                                if ev_priority_remaining_ns <= 10:
-                                    if not ev_keep_green_priority_ns:
-                                        print(f"🚑 EV CRITICAL: Keeping North/South green until EV clears")
-                                    ev_keep_green_priority_ns = True
-                                    self.phase_remaining_time = -1
-                                    self.phase_remaining_times["NorthSouth"] = -1
-                                else:
-                                    if ev_keep_green_priority_ns:
-                                        ev_keep_green_priority_ns = False
-                                        break
-                            else:
-                                if ev_keep_green_priority_ns:
-                                    ev_keep_green_priority_ns = False
-                                    break
-                        else:
-                            if ev_keep_green_priority_ns:
-                                print(f"✅ EV cleared - resuming normal cycle")
-                                ev_keep_green_priority_ns = False
-                                break
-                        
-                        if not ev_keep_green_priority_ns:
-                            elapsed = time.time() - self.phase_start_time
-                            remaining = max(0, green_time_ns_ev - elapsed)
-                            self.phase_remaining_time = remaining
-                            self.phase_remaining_times["NorthSouth"] = remaining
-                        if time.time() - last_push_time >= 0.5:
-                            try:
-                                from dashboard import push_live_update
-                                push_live_update()
-                                last_push_time = time.time()
-                            except:
-                                pass
-                        time.sleep(0.1)
-                    # Skip to end of cycle after EV lane green
-                    self.log_statistics(self.current_counts, signal_timings, self.current_phase)
-                    self.cycles_completed += 1
-                    continue
-                
-                # Normal East/West phase
-                green_time_ew = signal_timings['EastWest']
-                # If EV is coming from East/West and <10s, extend green time
-                if ev_check_active2 and ev_check_remaining2 <= 10 and ev_check_group2 == "EastWest":
-                    green_time_ew = max(green_time_ew, int(ev_check_remaining2 + 15))  # Stay green until EV passes
-                    print(f"🚑 EV CRITICAL: {ev_check_lane2} lane, {int(ev_check_remaining2)}s - Extending East/West green to {green_time_ew}s")
-                
-                print(f"\n🟢 Phase 4: East/West GREEN ({green_time_ew}s)")
-                self.current_phase = "EastWest_Green"
-                self.phase_start_time = time.time()  # Reset phase start time
-                self.phase_remaining_time = green_time_ew  # Set initial remaining time
-                self.phase_remaining_times = {"NorthSouth": 0, "EastWest": green_time_ew}
-                self.send_signal_to_arduino("L1", "R")  # North/South red
-                time.sleep(0.1)
-                self.send_signal_to_arduino("L2", "G")  # East/West green
-                start_time = time.time()
-                last_push_time = time.time()
-                ev_keep_green_ew = False
-                while time.time() - start_time < green_time_ew or ev_keep_green_ew:
-                    # Check EV state DURING phase
-                    evp_state_during_ew = self._load_evp_state()
-                    if evp_state_during_ew.get("active") and evp_state_during_ew.get("lane"):
-                        ev_during_lane_ew = evp_state_during_ew["lane"]
-                        ev_during_arrival_ew = evp_state_during_ew.get("expected_arrival_ts", 0)
-                        ev_during_remaining_ew = max(0, ev_during_arrival_ew - time.time())
-                        ev_during_group_ew = None
-                        if ev_during_lane_ew in self.lane_groups.get("NorthSouth", []):
-                            ev_during_group_ew = "NorthSouth"
-                        elif ev_during_lane_ew in self.lane_groups.get("EastWest", []):
-                            ev_during_group_ew = "EastWest"
-                        
-                        # CRITICAL: If EV is <10s and we're in EV lane, keep it green indefinitely
-                        if ev_during_remaining_ew <= 10 and ev_during_group_ew == "EastWest":
-                            # EV from East/West and we're in East/West - keep green!
-                            if not ev_keep_green_ew:
-                                print(f"🚑 EV CRITICAL: {ev_during_lane_ew} lane, {int(ev_during_remaining_ew)}s - Keeping East/West green until EV clears")
-                            ev_keep_green_ew = True
-                            # Set special value for "--" display
-                            self.phase_remaining_time = -1
-                            self.phase_remaining_times["EastWest"] = -1
-                        # CRITICAL: If EV is <10s and we're in wrong phase, transition NOW
-                        elif ev_during_remaining_ew <= 10 and ev_during_group_ew == "NorthSouth":
-                            # EV from North/South but we're in East/West - transition immediately
-                            print(f"🚑 EV CRITICAL DURING PHASE: {ev_during_lane_ew} lane, {int(ev_during_remaining_ew)}s - Transitioning to North/South NOW")
-                            ev_keep_green_ew = False
-                            break  # Exit current phase loop
-                        else:
-                            # EV not critical or cleared
-                            if ev_keep_green_ew:
-                                print(f"✅ EV cleared or passed - resuming normal cycle")
-                                ev_keep_green_ew = False
-                                break
-                    else:
-                        # EV cleared
-                        if ev_keep_green_ew:
-                            print(f"✅ EV cleared - resuming normal cycle")
-                            ev_keep_green_ew = False
-                            break
-                    
-                    # Update remaining time continuously (only if not in EV keep-green mode)
-                    if not ev_keep_green_ew:
-                        elapsed = time.time() - self.phase_start_time
-                        remaining = max(0, green_time_ew - elapsed)
-                        self.phase_remaining_time = remaining
-                        self.phase_remaining_times["EastWest"] = remaining
-                    # Push updates to web dashboard every 0.5 seconds
-                    if time.time() - last_push_time >= 0.5:
-                        try:
-                            from dashboard import push_live_update
-                            push_live_update()
-                            last_push_time = time.time()
-                        except:
-                            pass
-                    time.sleep(0.1)
-                
-                # After East/West green, check if we need to skip to EV lane (North/South)
-                evp_state_after_ew = self._load_evp_state()
-                if evp_state_after_ew.get("active") and evp_state_after_ew.get("lane"):
-                    ev_after_lane_ew = evp_state_after_ew["lane"]
-                    ev_after_arrival_ew = evp_state_after_ew.get("expected_arrival_ts", 0)
-                    ev_after_remaining_ew = max(0, ev_after_arrival_ew - time.time())
-                    ev_after_group_ew = None
-                    if ev_after_lane_ew in self.lane_groups.get("NorthSouth", []):
-                        ev_after_group_ew = "NorthSouth"
-                    elif ev_after_lane_ew in self.lane_groups.get("EastWest", []):
-                        ev_after_group_ew = "EastWest"
-                    
-                    if ev_after_remaining_ew <= 10 and ev_after_group_ew == "NorthSouth":
-                        # Skip yellow and all-red, go directly to North/South green
-                        print(f"🚑 EV CRITICAL: Skipping yellow/all-red, going to North/South green")
-                        green_time_ns_emergency = signal_timings['NorthSouth']
-                        if ev_after_remaining_ew > 0:
-                            green_time_ns_emergency = max(green_time_ns_emergency, int(ev_after_remaining_ew + 15))
-                        print(f"\n🟢 Phase 1 (EV PRIORITY): North/South GREEN ({green_time_ns_emergency}s)")
-                        self.current_phase = "NorthSouth_Green"
-                        self.phase_start_time = time.time()
-                        self.phase_remaining_time = green_time_ns_emergency
-                        self.phase_remaining_times = {"NorthSouth": green_time_ns_emergency, "EastWest": 0}
-                        self.send_signal_to_arduino("L1", "G")
-                        time.sleep(0.1)
-                        self.send_signal_to_arduino("L2", "R")
-                        start_time = time.time()
-                        last_push_time = time.time()
-                        ev_keep_green_emergency_ns = False
-                        while time.time() - start_time < green_time_ns_emergency or ev_keep_green_emergency_ns:
-                            # Check EV state - keep green if <10s
-                            evp_state_emergency_ns = self._load_evp_state()
-                            if evp_state_emergency_ns.get("active") and evp_state_emergency_ns.get("lane"):
-                                ev_emergency_lane_ns = evp_state_emergency_ns["lane"]
-                                ev_emergency_arrival_ns = evp_state_emergency_ns.get("expected_arrival_ts", 0)
-                                ev_emergency_remaining_ns = max(0, ev_emergency_arrival_ns - time.time())
-                                if ev_emergency_lane_ns in self.lane_groups.get("NorthSouth", []):
-                                    if ev_emergency_remaining_ns <= 10:
-                                        if not ev_keep_green_emergency_ns:
-                                            print(f"🚑 EV CRITICAL: Keeping North/South green until EV clears")
-                                        ev_keep_green_emergency_ns = True
-                                        self.phase_remaining_time = -1
-                                        self.phase_remaining_times["NorthSouth"] = -1
-                                    else:
-                                        if ev_keep_green_emergency_ns:
-                                            ev_keep_green_emergency_ns = False
-                                            break
-                                else:
-                                    if ev_keep_green_emergency_ns:
-                                        ev_keep_green_emergency_ns = False
-                                        break
-                            else:
-                                if ev_keep_green_emergency_ns:
-                                    print(f"✅ EV cleared - resuming normal cycle")
-                                    ev_keep_green_emergency_ns = False
-                                    break
-                            
-                            if not ev_keep_green_emergency_ns:
-                                elapsed = time.time() - self.phase_start_time
-                                remaining = max(0, green_time_ns_emergency - elapsed)
-                                self.phase_remaining_time = remaining
-                                self.phase_remaining_times["NorthSouth"] = remaining
-                            if time.time() - last_push_time >= 0.5:
-                                try:
-                                    from dashboard import push_live_update
-                                    push_live_update()
-                                    last_push_time = time.time()
-                                except:
-                                    pass
-                            time.sleep(0.1)
-                        self.log_statistics(self.current_counts, signal_timings, self.current_phase)
-                        self.cycles_completed += 1
-                        continue
-                
-                # Phase 5: East/West YELLOW, North/South RED
-                # GOLDEN RULE: Always complete the full countdown
-                print(f"🟡 Phase 5: East/West YELLOW ({self.YELLOW_TIME}s)")
-                self.current_phase = "EastWest_Yellow"
-                self.phase_start_time = time.time()  # Reset phase start time
-                self.phase_remaining_time = self.YELLOW_TIME  # Set initial remaining time
-                self.phase_remaining_times = {"NorthSouth": 0, "EastWest": self.YELLOW_TIME}
-                self.send_signal_to_arduino("L2", "Y")
-                time.sleep(0.1)
-                self.send_signal_to_arduino("L1", "R")
-                start_time = time.time()
-                last_push_time = time.time()
-                while time.time() - start_time < self.YELLOW_TIME:
-                    # Update remaining time continuously
-                    elapsed = time.time() - self.phase_start_time
-                    remaining = max(0, self.YELLOW_TIME - elapsed)
-                    self.phase_remaining_time = remaining
-                    self.phase_remaining_times["EastWest"] = remaining
-                    self.phase_remaining_times["NorthSouth"] = 0
-                    # Push updates to web dashboard every 0.5 seconds
-                    if time.time() - last_push_time >= 0.5:
-                        try:
-                            from dashboard import push_live_update
-                            push_live_update()
-                            last_push_time = time.time()
-                        except:
-                            pass
-                    time.sleep(0.1)
-                
-                # Phase 6: ALL RED (safety buffer)
-                # GOLDEN RULE: Always complete the full countdown
-                print(f"🔴 Phase 6: ALL RED ({self.ALL_RED_TIME}s)")
-                self.current_phase = "All_Red"
-                self.phase_start_time = time.time()  # Reset phase start time
-                self.phase_remaining_time = self.ALL_RED_TIME  # Set initial remaining time
-                self.phase_remaining_times = {"NorthSouth": self.ALL_RED_TIME, "EastWest": self.ALL_RED_TIME}
-                self.send_signal_to_arduino("L1", "R")
-                time.sleep(0.1)
-                self.send_signal_to_arduino("L2", "R")
-                start_time = time.time()
-                last_push_time = time.time()
-                while time.time() - start_time < self.ALL_RED_TIME:
-                    # Update remaining time continuously
-                    elapsed = time.time() - self.phase_start_time
-                    remaining = max(0, self.ALL_RED_TIME - elapsed)
-                    self.phase_remaining_time = remaining
-                    self.phase_remaining_times["NorthSouth"] = remaining
-                    self.phase_remaining_times["EastWest"] = remaining
-                    # Push updates to web dashboard every 0.5 seconds
-                    if time.time() - last_push_time >= 0.5:
-                        try:
-                            from dashboard import push_live_update
-                            push_live_update()
-                            last_push_time = time.time()
-                        except:
-                            pass
-                    time.sleep(0.1)
-                
-                # Log statistics
-                self.log_statistics(self.current_counts, signal_timings, self.current_phase)
-                self.cycles_completed += 1
-                
-                # Push live update to web dashboard via WebSocket
-                try:
-                    from dashboard import push_live_update
-                    push_live_update()
-                except Exception as e:
-                    pass  # Silently fail if dashboard not available
-                
-                print(f"\n{'=' * 60}\n")
+                # Each half gives one group green -> yellow -> all red. A critical
+                # EV (<10s away) for the other group jumps straight to that
+                # group's green, before or right after this half's green, and
+                # ends the cycle there.
+                for group, green, yellow, all_red in SIGNAL_CYCLE:
+                    other = OTHER_GROUP[group]
+
+                    # Check EV state RIGHT BEFORE starting the green phase
+                    ev = critical_ev()
+                    if preempt(ev, other, f"Skipping {GROUP_LABELS[group]}, going to {GROUP_LABELS[other]}"):
+                        break
+
+                    green_time = signal_timings[group]
+                    # If EV is coming from this group and <10s, extend green time
+                    if ev and ev.group == group:
+                        green_time = ev_green_time(green_time, ev)
+                        self.log.info("🚑 EV CRITICAL: %s lane, %ds - Extending %s green to %ss",
+                                      ev.lane, ev.remaining, GROUP_LABELS[group], green_time)
+                    self._run_phase(green, green_time, check_ev_during_green[group])
+
+                    # After the green, check if we need to skip to the EV lane
+                    if preempt(critical_ev(), other, f"Skipping yellow/all-red, going to {GROUP_LABELS[other]} green"):
+                        break
+
+                    # GOLDEN RULE: Always complete the full countdown
+                    self._run_phase(yellow, self.YELLOW_TIME)
+                    self._run_phase(all_red, self.ALL_RED_TIME)
+
+                if not self.running:
+                    break  # stopped mid-cycle: don't log a partial cycle
+
+                self._finish_cycle(signal_timings)
                 
         except KeyboardInterrupt:
             self.running = False
+
+    def _finish_cycle(self, signal_timings):
+        """Log a completed cycle (normal or EV-preempted) exactly once"""
+        # The entry is queued for the log writer thread, which tells the
+        # dashboard (push hook or /notify_update) once the line is on disk
+        self.cycles_completed += 1
+        self.log_statistics(self.current_counts, signal_timings, self.current_phase)
+
+        self.log.info("\n%s\n", "=" * 60)
     
+    def _wait_for_server(self, server_thread, ready, timeout=10.0):
+        """Block until the server thread reports its socket bound (False if it died or timed out)"""
+        # A connect probe can't tell our server from another process already
+        # holding the port, so only the server's own signal counts
+        deadline = time.monotonic() + timeout
+        while not ready.wait(0.05):
+            if not server_thread.is_alive() or time.monotonic() >= deadline:
+                return False
+        return True
+
     def run(self, register_with_dashboard=True, start_flask_server=True):
         """Main execution loop - starts video processing and traffic control"""
         self.connect_cameras()
@@ -1497,50 +1875,98 @@ class TrafficSignalController:
         # Register with Flask dashboard for video streaming
         if register_with_dashboard:
             try:
-                from dashboard import set_traffic_controller, app, socketio
+                from dashboard import set_traffic_controller, run_server, push_live_update
                 set_traffic_controller(self)
+                # Bind the push hook once; phase ticks call it directly
+                self._push = push_live_update
+                self._push_enabled = True
                 print("✅ Registered with web dashboard for video streaming")
                 
                 # Start Flask server in a separate thread (if requested)
                 if start_flask_server:
+                    server_ready = threading.Event()
+
                     def run_flask():
                         print("\n" + "=" * 60)
                         print("🚀 Starting IntelliFlow Flask Server...")
                         print("📡 WebSocket enabled for real-time updates")
                         print("🔗 React frontend should connect to: http://127.0.0.1:5000")
                         print("=" * 60 + "\n")
-                        socketio.run(app, host="0.0.0.0", port=5000, debug=False, use_reloader=False, allow_unsafe_werkzeug=True)
+                        run_server(host="0.0.0.0", port=5000, ready=server_ready)
                     
                     flask_thread = threading.Thread(target=run_flask, daemon=True)
                     flask_thread.start()
-                    print("✅ Flask server started in background thread")
-                    # Give Flask a moment to start
-                    time.sleep(2)
+                    # Continue as soon as the server is bound
+                    if self._wait_for_server(flask_thread, server_ready):
+                        # Same process as the server: notify by calling the push
+                        # hook. Not when the bind failed: then a standalone
+                        # dashboard owns the port and needs /notify_update
+                        self._dashboard_in_process = True
+                        print("✅ Flask server started in background thread")
+                    else:
+                        print("⚠️ Flask server not listening on port 5000 (already in use?), continuing without it")
             except Exception as e:
                 print(f"⚠️ Could not register with dashboard: {e}")
                 print("⚠️ Web dashboard will not be available")
         
         # Start video processing in a separate thread
-        video_thread = threading.Thread(target=self.process_video_feeds, daemon=True)
-        video_thread.start()
+        self.running = True
+        self._shutdown_evt.clear()
+        self._video_thread = threading.Thread(target=self.process_video_feeds, daemon=True)
+        self._video_thread.start()
         
         # Run traffic control in main thread
         try:
             self.run_traffic_control()
         finally:
-            self.running = False
-            for cap in self.captures.values():
+            # Each shutdown step is isolated so a failure (or a hang in the GUI
+            # teardown) can never keep the intersection from going all-red.
+            # 1. Stop worker loops
+            self.stop()
+            self._shutdown_evt.set()
+
+            # 2. Safety first: both lanes red, then close the port
+            try:
+                self.send_signals_to_arduino("R", "R")
+                # Let the writer drain the queue (including the reds) and stop
+                self._enqueue_arduino(None)
+                self._arduino_thread.join(timeout=2.0)
+                # The lock keeps close() from cutting into a write still in
+                # progress; it is never held across a reconnect, so this waits
+                # at most one write. Clearing self.arduino tells a writer that
+                # is still reconnecting to drop its new port.
+                with self._serial_lock:
+                    if self.arduino:
+                        self.arduino.close()
+                        self.arduino = None
+            except Exception as e:
+                print(f"⚠️ Arduino shutdown failed: {e}")
+
+            # 3. Release cameras once the video/capture threads have stopped reading them.
+            # They all stop together, so they share one 1s deadline rather
+            # than a second each
+            join_deadline = time.monotonic() + 1.0
+            for thread in [self._video_thread] + self._capture_threads:
+                try:
+                    thread.join(timeout=max(0.0, join_deadline - time.monotonic()))
+                except Exception:
+                    pass
+            # Network cameras can block on socket teardown, so release them in
+            # parallel: shutdown takes the slowest release, not the sum
+            def release(cap):
                 try:
                     cap.release()
                 except Exception:
                     pass
-            cv2.destroyAllWindows()
-            
-            if self.arduino:
-                # Set both lanes to red on shutdown
-                self.send_signal_to_arduino("L1", "R")
-                self.send_signal_to_arduino("L2", "R")
-                self.arduino.close()
+            if self.captures:
+                with ThreadPoolExecutor(max_workers=len(self.captures)) as pool:
+                    list(pool.map(release, self.captures.values()))
+
+            # 4. Close any local preview windows
+            try:
+                cv2.destroyAllWindows()
+            except Exception:
+                pass
             
             print("\n" + "=" * 60)
             print("✅ IntelliFlow System Stopped")
@@ -1549,9 +1975,22 @@ class TrafficSignalController:
             print(f"   Total Vehicles Detected: {self.total_vehicles_detected}")
             print(f"   Cycles Completed: {self.cycles_completed}")
             print(f"   Log Entries: {len(self.log_data)}")
-            print(f"   Data saved to: traffic_log.json")
+            print(f"   Data saved to: traffic_log.jsonl")
             print("\n" + "=" * 60 + "\n")
 
+            # 5. Drop pending dashboard notifications, finish queued log
+            # writes, flush queued log records
+            self._notify_pool.shutdown(wait=False, cancel_futures=True)
+            try:
+                self._log_pool.shutdown(wait=True)
+                self._log_fh.close()
+            except Exception:
+                pass
+            try:
+                self._log_listener.stop()
+            except Exception:
+                pass
+
 
 # =============================================================
 # Run IntelliFlow